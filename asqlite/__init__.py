@@ -24,10 +24,16 @@ import sqlite3
 import threading
 import queue
 import asyncio
+import itertools
+import collections
+import types
 
 PARSE_DECLTYPES = sqlite3.PARSE_DECLTYPES
 PARSE_COLNAMES = sqlite3.PARSE_COLNAMES
 
+# Default number of rows fetched per worker round-trip when iterating a cursor
+PAGE_SIZE = 100
+
 
 class _WorkerEntry:
     __slots__ = ('func', 'args', 'kwargs', 'future', 'cancelled')
@@ -40,23 +46,53 @@ class _WorkerEntry:
 
 
 class _Worker(threading.Thread):
-    def __init__(self, *, loop):
-        super().__init__(name='asqlite-worker-thread', daemon=True)
+    def __init__(self, *, loop, name='asqlite-worker-thread'):
+        super().__init__(name=name, daemon=True)
         self.loop = loop
         self._worker_queue = queue.Queue()
         self._end = threading.Event()
+        # Results waiting for the event loop to set them, and whether it has been woken up for them yet
+        self._results = collections.deque()
+        self._wakeup_pending = False
 
-    def _call_entry(self, entry):
+    @staticmethod
+    def _call_entry(entry):
         fut = entry.future
         if fut.cancelled():
-            return
+            return None
 
         try:
             result = entry.func(*entry.args, **entry.kwargs)
         except Exception as e:
-            self.loop.call_soon_threadsafe(fut.set_exception, e)
+            return fut, False, e
         else:
-            self.loop.call_soon_threadsafe(fut.set_result, result)
+            return fut, True, result
+
+    def _set_results(self):
+        # Cleared before taking results, so a result added after this point schedules another call
+        self._wakeup_pending = False
+        results = self._results
+
+        while results:
+            fut, ok, value = results.popleft()
+
+            # The future might have been cancelled while the entry was running
+            if fut.done():
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def _hand_off(self, result):
+        # Every result goes back as soon as its entry is done, but only the first one waiting wakes up
+        # the event loop, so a burst of quick calls shares one threadsafe callback without any of them
+        # waiting on a slow call queued after it
+        self._results.append(result)
+
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self.loop.call_soon_threadsafe(self._set_results)
 
     def run(self):
         _queue = self._worker_queue
@@ -65,8 +101,10 @@ class _Worker(threading.Thread):
                 entry = _queue.get(timeout=0.2)
             except queue.Empty:
                 continue
-            else:
-                self._call_entry(entry)
+
+            result = self._call_entry(entry)
+            if result is not None:
+                self._hand_off(result)
 
     def post(self, func, *args, **kwargs):
         future = self.loop.create_future()
@@ -77,6 +115,10 @@ class _Worker(threading.Thread):
     def stop(self):
         self._end.set()
 
+    @property
+    def pending(self):
+        return self._worker_queue.qsize()
+
 
 class _ContextManagerMixin:
     def __init__(self, _queue, _factory, func, *args, timeout=None, **kwargs):
@@ -115,6 +157,8 @@ class _ContextManagerMixin:
 class Cursor:
     """An asyncio-compatible version of :class:`sqlite3.Cursor`.
     Create these with :meth:`Connection.cursor`.
+    This can be iterated over with ``async for`` after executing a query,
+    see :meth:`iterate`.
     """
 
     def __init__(self, connection, cursor):
@@ -128,6 +172,9 @@ class Cursor:
     async def __aexit__(self, exc_type, exc, tb):
         await self.close()
 
+    def __aiter__(self):
+        return self.iterate()
+
     def get_cursor(self):
         """Retrieves the internal :class:`sqlite3.Cursor` object."""
         return self._cursor
@@ -145,11 +192,11 @@ class Cursor:
         """Asynchronous version of :meth:`sqlite3.Cursor.execute`."""
         if len(parameters) == 1 and isinstance(parameters[0], (dict, tuple)):
             parameters = parameters[0]
-        return await self._post(self._cursor.execute, sql, parameters)
+        return await self._post(self._cursor.execute, self._conn._resolve(sql), parameters)
 
     async def executemany(self, sql, seq_of_parameters):
         """Asynchronous version of :meth:`sqlite3.Cursor.executemany`."""
-        return await self._post(self._cursor.executemany, sql, seq_of_parameters)
+        return await self._post(self._cursor.executemany, self._conn._resolve(sql), seq_of_parameters)
 
     async def executescript(self, sql_script):
         """Asynchronous version of :meth:`sqlite3.Cursor.executescript`."""
@@ -168,6 +215,22 @@ class Cursor:
         """Asynchronous version of :meth:`sqlite3.Cursor.fetchall`."""
         return await self._post(self._cursor.fetchall)
 
+    async def iterate(self, size=None):
+        """Asynchronously iterates over the remaining rows of the current query.
+        Rows are fetched on the worker thread ``size`` at a time with
+        :meth:`sqlite3.Cursor.fetchmany`, so only one page is held in memory.
+        ``size`` defaults to :data:`PAGE_SIZE`.
+        """
+        size = size or PAGE_SIZE
+
+        while True:
+            rows = await self._post(self._cursor.fetchmany, size)
+            if not rows:
+                return
+
+            for row in rows:
+                yield row
+
 
 class Transaction:
     """An asyncio-compatible transaction for sqlite3.
@@ -226,6 +289,133 @@ class _CursorWithTransaction(Cursor):
             await self.close()
 
 
+def _run_group_commit(connection, entries):
+    # Joining a transaction someone else opened would report writes as committed
+    # before they are, and a rollback of that transaction would silently undo them
+    if connection.in_transaction:
+        error = sqlite3.OperationalError('cannot group commit while a transaction is open')
+        return [(False, error)] * len(entries)
+
+    results = []
+    connection.execute('BEGIN')
+
+    try:
+        for sql, parameters in entries:
+            # Each write gets a savepoint so one bad statement doesn't fail the whole batch
+            connection.execute('SAVEPOINT asqlite_group_commit')
+            try:
+                cursor = connection.execute(sql, parameters)
+            except Exception as e:
+                connection.execute('ROLLBACK TO asqlite_group_commit')
+                results.append((False, e))
+            else:
+                results.append((True, cursor.rowcount))
+            connection.execute('RELEASE asqlite_group_commit')
+
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+
+    return results
+
+
+def _run_chunk(connection, sql, chunk):
+    # Same as group commit, every chunk has to be committed when it resolves
+    if connection.in_transaction:
+        raise sqlite3.OperationalError('cannot bulk write while a transaction is open')
+
+    connection.execute('BEGIN')
+
+    try:
+        cursor = connection.executemany(sql, chunk)
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+
+    return cursor.rowcount
+
+
+async def _iter_chunks(parameters, size):
+    if hasattr(parameters, '__aiter__'):
+        chunk = []
+        async for params in parameters:
+            chunk.append(params)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    else:
+        iterator = iter(parameters)
+        while chunk := list(itertools.islice(iterator, size)):
+            yield chunk
+
+
+class _GroupCommitter:
+    def __init__(self, connection, *, window, max_batch):
+        self._conn = connection
+        self._loop = connection._queue.loop
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._handle = None
+        self._in_flight = set()
+
+    def submit(self, sql, parameters):
+        future = self._loop.create_future()
+        self._pending.append((sql, parameters, future))
+
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._handle is None:
+            self._handle = self._loop.call_later(self.window, self.flush)
+
+        return future
+
+    def flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        batch = [entry for entry in self._pending if not entry[2].cancelled()]
+        self._pending = []
+
+        if not batch:
+            return
+
+        entries = [(sql, parameters) for sql, parameters, _ in batch]
+        batch_future = self._conn._post(_run_group_commit, self._conn._conn, entries)
+        self._in_flight.add(batch_future)
+        batch_future.add_done_callback(lambda fut: self._complete(batch, fut))
+
+    def _complete(self, batch, batch_future):
+        self._in_flight.discard(batch_future)
+
+        if batch_future.cancelled():
+            results = [(False, asyncio.CancelledError())] * len(batch)
+        elif batch_future.exception() is not None:
+            results = [(False, batch_future.exception())] * len(batch)
+        else:
+            results = batch_future.result()
+
+        for (_, _, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def drain(self):
+        self.flush()
+        if self._in_flight:
+            await asyncio.wait(self._in_flight)
+
+
 class Connection:
     """An asyncio-compatible version of :class:`sqlite3.Connection`.
     Create these with :func:`.connect`.
@@ -236,10 +426,13 @@ class Connection:
         set to ``None`` and the journal_mode is set to ``WAL``.
     """
 
-    def __init__(self, connection, queue):
+    def __init__(self, connection, queue, *, commit_window=0, max_commit_batch=64, cached_statements=128):
         self._conn = connection
         self._queue = queue
         self._post = queue.post
+        self._committer = _GroupCommitter(self, window=commit_window, max_batch=max_commit_batch)
+        self._cached_statements = cached_statements
+        self._statements = {}
 
     async def __aenter__(self):
         return self
@@ -251,6 +444,28 @@ class Connection:
         """Retrieves the internal :class:`sqlite3.Connection` object."""
         return self._conn
 
+    @property
+    def statements(self):
+        """A read-only mapping of the registered statement names to their SQL."""
+        return types.MappingProxyType(self._statements)
+
+    def register(self, name, sql):
+        """Registers a SQL statement under a name.
+        The name can then be passed anywhere this connection takes SQL,
+        so every call site shares the exact same SQL string and hits
+        the :mod:`sqlite3` prepared statement cache.
+        Raises :exc:`ValueError` if registering would go over ``cached_statements``,
+        since statements would start getting evicted from the cache.
+        """
+        if name not in self._statements and len(self._statements) >= self._cached_statements:
+            raise ValueError(f'Can\'t register more than {self._cached_statements} statements')
+
+        self._statements[name] = sql
+        return sql
+
+    def _resolve(self, sql):
+        return self._statements.get(sql, sql)
+
     def transaction(self):
         """Gets a transaction object.
         This can be used similarly to ``asyncpg.Transaction``.
@@ -289,9 +504,43 @@ class Connection:
 
     async def close(self):
         """Asynchronous version of :meth:`sqlite3.Connection.close`."""
+        await self._committer.drain()
         await self._post(self._conn.close)
         self._queue.stop()
 
+    async def write(self, sql, *parameters):
+        """Executes a write statement and commits it using group commit.
+        Writes made within ``commit_window`` seconds of each other, up to
+        ``max_commit_batch`` of them, are executed in a single transaction,
+        so the whole batch only pays for one commit.
+        Resolves to the statement's row count once the batch has been committed,
+        or raises the error the statement caused, without affecting the other
+        writes in the batch.
+        Raises :exc:`sqlite3.OperationalError` if a transaction is open on the
+        connection when the batch runs, use :meth:`execute` inside transactions.
+        """
+        if len(parameters) == 1 and isinstance(parameters[0], (dict, tuple)):
+            parameters = parameters[0]
+
+        return await self._committer.submit(self._resolve(sql), parameters)
+
+    async def bulk(self, sql, parameters, *, chunk_size=500):
+        """Executes a statement for every item of an iterable or asynchronous iterable
+        of parameters, using :meth:`sqlite3.Connection.executemany`.
+        Parameters are sent to the worker thread ``chunk_size`` at a time, and
+        each chunk is committed in a single transaction.
+        Resolves to the total number of rows changed.
+        Raises :exc:`sqlite3.OperationalError` if a transaction is open on the
+        connection, use :meth:`executemany` inside transactions.
+        """
+        sql = self._resolve(sql)
+        total = 0
+
+        async for chunk in _iter_chunks(parameters, chunk_size):
+            total += await self._post(_run_chunk, self._conn, sql, chunk)
+
+        return total
+
     def execute(self, sql, *parameters):
         """Asynchronous version of :meth:`sqlite3.Connection.execute`.
         Note that this returns a :class:`Cursor` instead of a :class:`sqlite3.Cursor`.
@@ -300,14 +549,16 @@ class Connection:
             parameters = parameters[0]
 
         factory = lambda cur: Cursor(self, cur)
-        return _ContextManagerMixin(self._queue, factory, self._conn.execute, sql, parameters)
+        return _ContextManagerMixin(self._queue, factory, self._conn.execute, self._resolve(sql), parameters)
 
     def executemany(self, sql, seq_of_parameters):
         """Asynchronous version of :meth:`sqlite3.Connection.executemany`.
         Note that this returns a :class:`Cursor` instead of a :class:`sqlite3.Cursor`.
         """
         factory = lambda cur: Cursor(self, cur)
-        return _ContextManagerMixin(self._queue, factory, self._conn.executemany, sql, seq_of_parameters)
+        return _ContextManagerMixin(
+            self._queue, factory, self._conn.executemany, self._resolve(sql), seq_of_parameters
+        )
 
     def executescript(self, sql_script):
         """Asynchronous version of :meth:`sqlite3.Connection.executescript`.
@@ -331,17 +582,157 @@ class Connection:
         async with self.execute(query, *parameters) as cursor:
             return await cursor.fetchall()
 
+    async def iterate(self, query, *parameters, size=None):
+        """Shortcut method version of :meth:`Cursor.iterate` without making a cursor.
+        .. code-block:: python3
+            async for row in conn.iterate("SELECT * FROM table", size=500):
+                ...
+        """
+        async with self.execute(query, *parameters) as cursor:
+            async for row in cursor.iterate(size):
+                yield row
+
+
+class Pool:
+    """A pool of :class:`Connection` objects that share a single database.
+    Create these with :func:`create_pool`.
+    Every write goes through a single writer connection, so writes stay
+    serialized, while reads are spread across the reader connections.
+    Each connection gets its own worker thread, so reads never have to wait
+    in the same queue as a pending write or commit.
+    .. note::
+        This relies on the journal_mode being set to ``WAL``, which lets
+        readers run concurrently with the writer. As such, it can't be used
+        with an in-memory database.
+    """
 
-def _connect_pragmas(db, **kwargs):
+    def __init__(self, writer, readers):
+        self._writer = writer
+        self._readers = readers
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def writer(self):
+        """Retrieves the :class:`Connection` used for writes."""
+        return self._writer
+
+    @property
+    def readers(self):
+        """Retrieves the list of :class:`Connection` objects used for reads."""
+        return list(self._readers)
+
+    @property
+    def statements(self):
+        """A read-only mapping of the registered statement names to their SQL."""
+        return self._writer.statements
+
+    def register(self, name, sql):
+        """Registers a statement on every connection in the pool, see :meth:`Connection.register`."""
+        for conn in (self._writer, *self._readers):
+            conn.register(name, sql)
+        return sql
+
+    def reader(self):
+        """Retrieves the least busy reader :class:`Connection`.
+        Use this when a read needs a cursor, otherwise prefer the
+        ``fetch*`` shortcut methods.
+        """
+        return min(self._readers, key=lambda conn: conn._queue.pending)
+
+    def transaction(self):
+        """Gets a transaction object on the writer connection."""
+        return self._writer.transaction()
+
+    def cursor(self, *, transaction=False):
+        """Same as :meth:`Connection.cursor`, using the writer connection."""
+        return self._writer.cursor(transaction=transaction)
+
+    async def commit(self):
+        """Commits on the writer connection."""
+        return await self._writer.commit()
+
+    async def rollback(self):
+        """Rolls back on the writer connection."""
+        return await self._writer.rollback()
+
+    async def close(self):
+        """Closes every connection in the pool."""
+        await asyncio.gather(self._writer.close(), *(reader.close() for reader in self._readers))
+
+    def execute(self, sql, *parameters):
+        """Same as :meth:`Connection.execute`, using the writer connection."""
+        return self._writer.execute(sql, *parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """Same as :meth:`Connection.executemany`, using the writer connection."""
+        return self._writer.executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        """Same as :meth:`Connection.executescript`, using the writer connection."""
+        return self._writer.executescript(sql_script)
+
+    async def write(self, sql, *parameters):
+        """Same as :meth:`Connection.write`, using the writer connection."""
+        return await self._writer.write(sql, *parameters)
+
+    async def bulk(self, sql, parameters, *, chunk_size=500):
+        """Same as :meth:`Connection.bulk`, using the writer connection."""
+        return await self._writer.bulk(sql, parameters, chunk_size=chunk_size)
+
+    async def fetchone(self, query, *parameters):
+        """Same as :meth:`Connection.fetchone`, using a reader connection."""
+        return await self.reader().fetchone(query, *parameters)
+
+    async def fetchmany(self, query, *parameters, size=None):
+        """Same as :meth:`Connection.fetchmany`, using a reader connection."""
+        return await self.reader().fetchmany(query, *parameters, size=size)
+
+    async def fetchall(self, query, *parameters):
+        """Same as :meth:`Connection.fetchall`, using a reader connection."""
+        return await self.reader().fetchall(query, *parameters)
+
+    def iterate(self, query, *parameters, size=None):
+        """Same as :meth:`Connection.iterate`, using a reader connection."""
+        return self.reader().iterate(query, *parameters, size=size)
+
+
+def _connect_pragmas(db, *, readonly=False, **kwargs):
     connection = sqlite3.connect(db, **kwargs)
     connection.execute('pragma journal_mode=wal')
     connection.execute('pragma foreign_keys=ON')
+    if readonly:
+        connection.execute('pragma query_only=ON')
     connection.isolation_level = None
     connection.row_factory = sqlite3.Row
     return connection
 
 
-def connect(database, *, init=None, timeout=None, loop=None, **kwargs):
+def _make_connect(init, **pragmas):
+    def new_connect(db, **kwargs):
+        con = _connect_pragmas(db, **pragmas, **kwargs)
+        if init is not None:
+            init(con)
+        return con
+
+    return new_connect
+
+
+def connect(
+        database,
+        *,
+        init=None,
+        timeout=None,
+        loop=None,
+        commit_window=0,
+        max_commit_batch=64,
+        cached_statements=128,
+        **kwargs
+):
     """asyncio-compatible version of :func:`sqlite3.connect`.
     This can be used as a regular coroutine or in an async-with statement.
     For example, both are equivalent:
@@ -358,20 +749,115 @@ def connect(database, *, init=None, timeout=None, loop=None, **kwargs):
     A special keyword-only parameter named ``init`` can be passed which allows
     one to customize the :class:`sqlite3.Connection` before it is converted
     to a :class:`Connection` object.
+    The ``commit_window`` and ``max_commit_batch`` parameters configure how
+    :meth:`Connection.write` batches writes together.
+    ``cached_statements`` is passed to :func:`sqlite3.connect` and also caps how many
+    statements can be registered with :meth:`Connection.register`.
     """
     loop = loop or asyncio.get_event_loop()
     queue = _Worker(loop=loop)
     queue.start()
 
     def factory(con):
-        return Connection(con, queue)
+        return Connection(
+            con,
+            queue,
+            commit_window=commit_window,
+            max_commit_batch=max_commit_batch,
+            cached_statements=cached_statements
+        )
 
-    if init is not None:
-        def new_connect(db, **kwargs):
-            con = _connect_pragmas(db, **kwargs)
-            init(con)
-            return con
-    else:
-        new_connect = _connect_pragmas
+    return _ContextManagerMixin(
+        queue, factory, _make_connect(init), database,
+        timeout=timeout, cached_statements=cached_statements, **kwargs
+    )
+
+
+class _PoolContextManager:
+    def __init__(self, coro):
+        self._coro = coro
+        self._pool = None
+
+    async def _runner(self):
+        self._pool = await self._coro
+        return self._pool
+
+    def __await__(self):
+        return self._runner().__await__()
+
+    async def __aenter__(self):
+        return await self._runner()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._pool is not None:
+            await self._pool.close()
 
-    return _ContextManagerMixin(queue, factory, new_connect, database, timeout=timeout, **kwargs)
+
+async def _create_pool(database, size, init, timeout, loop, options, kwargs):
+    async def start(name, readonly):
+        worker = _Worker(loop=loop, name=name)
+        worker.start()
+        factory = lambda con: Connection(con, worker, **options)
+        new_connect = _make_connect(init, readonly=readonly)
+
+        try:
+            return await _ContextManagerMixin(
+                worker, factory, new_connect, database,
+                timeout=timeout, cached_statements=options['cached_statements'], **kwargs
+            )
+        except BaseException:
+            # There is no connection to close, so the thread has to be stopped here
+            worker.stop()
+            raise
+
+    # The writer connects first so the WAL journal_mode is set up before any reader opens
+    writer = await start('asqlite-writer-thread', False)
+
+    results = await asyncio.gather(
+        *(start(f'asqlite-reader-thread-{i}', True) for i in range(size)),
+        return_exceptions=True
+    )
+
+    readers = [conn for conn in results if isinstance(conn, Connection)]
+    errors = [exc for exc in results if isinstance(exc, BaseException)]
+
+    if errors:
+        await asyncio.gather(writer.close(), *(reader.close() for reader in readers))
+        raise errors[0]
+
+    return Pool(writer, readers)
+
+
+def create_pool(
+        database,
+        *,
+        size=4,
+        init=None,
+        timeout=None,
+        loop=None,
+        commit_window=0,
+        max_commit_batch=64,
+        cached_statements=128,
+        **kwargs
+):
+    """Creates a :class:`Pool` with one writer and ``size`` reader connections.
+    Much like :func:`connect` this can be used as both a coroutine
+    and an asynchronous context manager.
+    .. code-block:: python3
+        async with create_pool("data.db", size=4) as pool:
+            rows = await pool.fetchall("SELECT * FROM table")
+    Reader connections are opened with ``query_only`` set, so writes have to
+    go through the pool's writer connection.
+    The ``init``, ``commit_window``, ``max_commit_batch``, ``cached_statements``
+    and any other keyword arguments are passed to every connection.
+    """
+    if size < 1:
+        raise ValueError('size must be at least 1')
+
+    loop = loop or asyncio.get_event_loop()
+    options = {
+        'commit_window': commit_window,
+        'max_commit_batch': max_commit_batch,
+        'cached_statements': cached_statements
+    }
+    return _PoolContextManager(_create_pool(database, size, init, timeout, loop, options, kwargs))
@@ -0,0 +1,57 @@
+"""Synthetic images for the benchmarks, made the same way on every run so results can be compared."""
+
+import io
+
+from PIL import Image
+
+
+def make_frame(size: int, seed: int) -> Image:
+    # Three gradients at different angles as the color channels, so every frame has lots of colors for the
+    # palette and compression to work on, and the seed (the angle of the blue gradient) makes frames differ
+    gradient = Image.linear_gradient('L').resize((size, size))
+    frame = Image.merge('RGBA', (
+        gradient,
+        gradient.rotate(90),
+        gradient.rotate(seed),
+        Image.new('L', gradient.size, 255)
+    ))
+
+    return frame
+
+
+def make_png(size: int) -> bytes:
+    buffer = io.BytesIO()
+    make_frame(size, 45).save(buffer, 'png')
+
+    return buffer.getvalue()
+
+
+def make_jpeg(size: int) -> bytes:
+    buffer = io.BytesIO()
+    make_frame(size, 45).convert('RGB').save(buffer, 'jpeg', quality=90)
+
+    return buffer.getvalue()
+
+
+def make_gif(size: int, frame_count: int) -> bytes:
+    frames = [make_frame(size, i * 360 // frame_count) for i in range(frame_count)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, 'gif', save_all=True, append_images=frames[1:], duration=40, loop=0)
+
+    return buffer.getvalue()
+
+
+def make_fixture(name: str) -> bytes:
+    """Makes a fixture from its name, like `png-512`, `jpeg-1024` or `gif-256x30`"""
+
+    kind, _, spec = name.partition('-')
+
+    if kind == 'png':
+        return make_png(int(spec))
+    if kind == 'jpeg':
+        return make_jpeg(int(spec))
+    if kind == 'gif':
+        size, _, frame_count = spec.partition('x')
+        return make_gif(int(size), int(frame_count))
+
+    raise ValueError(f'Unknown fixture {name}')
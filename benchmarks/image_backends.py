@@ -0,0 +1,64 @@
+"""Compares the Pillow and NumPy versions of the image filters, including the ones the bot keeps on Pillow.
+
+Run from the repository root: python benchmarks/image_backends.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.image import (  # noqa: E402
+    hande_gif_images, invert_image, noise_image, make_flag, deepfry_image, np, FLAG_COLORS, NUMPY_FILTERS
+)
+from fixtures import make_png, make_gif  # noqa: E402
+
+FILTERS = {
+    'invert': (invert_image, ()),
+    'noise': (noise_image, (0.5,)),
+    'flag': (make_flag, (0.5, FLAG_COLORS['pride'])),
+    'deepfry': (deepfry_image, ())
+}
+
+
+def bench(func, image_bytes: bytes, args: tuple, use_numpy: bool, runs: int) -> float:
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        hande_gif_images(func, image_bytes, *args, numpy_filters=NUMPY_FILTERS if use_numpy else ())
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='runs per case, the median is reported')
+    parser.add_argument('--size', type=int, default=512, help='width and height of the test images')
+    parser.add_argument('--frames', type=int, default=30, help='frames in the test GIF')
+    options = parser.parse_args()
+
+    if np is None:
+        sys.exit('NumPy isn\'t installed, there is nothing to compare against')
+
+    inputs = {
+        f'png {options.size}px': make_png(options.size),
+        f'gif {options.size}px x{options.frames}': make_gif(options.size, options.frames)
+    }
+
+    print(f'{"filter":<10}{"input":<22}{"pillow":>10}{"numpy":>10}{"speedup":>10}')
+
+    for name, (func, args) in FILTERS.items():
+        for input_name, image_bytes in inputs.items():
+            pillow = bench(func, image_bytes, args, False, options.runs)
+            numpy = bench(func, image_bytes, args, True, options.runs)
+
+            print(f'{name:<10}{input_name:<22}{pillow * 1000:>8.1f}ms{numpy * 1000:>8.1f}ms{pillow / numpy:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
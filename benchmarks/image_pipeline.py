@@ -0,0 +1,175 @@
+"""Benchmarks every image filter on synthetic PNG, JPEG and GIF inputs.
+
+Each filter and input pair runs in a fresh process, so the peak RSS it reports belongs to that case alone.
+Results are printed and saved as JSON, and a previous run can be passed with --compare to see what changed.
+
+Run from the repository root: python benchmarks/image_pipeline.py
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+import PIL  # noqa: E402
+
+from cogs import image  # noqa: E402
+from fixtures import make_fixture  # noqa: E402
+
+FILTERS = {
+    'invert': (image.invert_image, ()),
+    'greyscale': (image.greyscale_image, ()),
+    'deepfry': (image.deepfry_image, ()),
+    'noise': (image.noise_image, (0.5,)),
+    'blur': (image.blur_image, (5,)),
+    'brighten': (image.brighten_image, (1.25,)),
+    'contrast': (image.contrast_image, (1.25,)),
+    'rotate': (image.rotate_image, (90,)),
+    'impact': (image.add_impact, ('top text', 'bottom text')),
+    **{f'flag-{name}': (image.make_flag, (0.5, colors)) for name, colors in image.FLAG_COLORS.items()}
+}
+
+FIXTURES = ['png-128', 'png-512', 'png-1024', 'jpeg-512', 'jpeg-1024', 'gif-128x10', 'gif-256x30']
+
+
+def peak_rss() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def run_case(filter_name: str, fixture_name: str, runs: int, warmup: int, use_numpy: bool) -> dict:
+    # Runs in its own process, the font path in add_impact is relative to the repository root
+    os.chdir(ROOT)
+
+    func, args = FILTERS[filter_name]
+    numpy_filters = image.NUMPY_DEFAULT_FILTERS if use_numpy else ()
+    image_bytes = make_fixture(fixture_name)
+    baseline_rss = peak_rss()
+
+    for _ in range(warmup):
+        image.hande_gif_images(func, image_bytes, *args, numpy_filters=numpy_filters)
+
+    latencies = []
+    output_bytes = 0
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        data, filename, _ = image.hande_gif_images(func, image_bytes, *args, numpy_filters=numpy_filters)
+        latencies.append(time.perf_counter() - start)
+        output_bytes = len(data)
+
+    return {
+        'filter': filter_name,
+        'fixture': fixture_name,
+        'runs': runs,
+        'throughput': runs / sum(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_mb': peak_rss() / 1024 / 1024,
+        'baseline_rss_mb': baseline_rss / 1024 / 1024,
+        'input_bytes': len(image_bytes),
+        'output_bytes': output_bytes,
+        'output_format': filename.rpartition('.')[2]
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results, previous=None):
+    previous = {(r['filter'], r['fixture']): r for r in (previous or [])}
+
+    header = f'{"filter":<18}{"fixture":<12}{"img/s":>9}{"p50":>11}{"p99":>11}{"peak rss":>11}'
+    print(header + ('  p50 change' if previous else ''))
+
+    for result in results:
+        line = (
+            f'{result["filter"]:<18}{result["fixture"]:<12}{result["throughput"]:>9.1f}'
+            f'{result["p50_ms"]:>9.1f}ms{result["p99_ms"]:>9.1f}ms{result["peak_rss_mb"]:>8.1f}MiB'
+        )
+
+        old = previous.get((result['filter'], result['fixture']))
+        if old:
+            line += f'{(result["p50_ms"] / old["p50_ms"] - 1) * 100:>+11.1f}%'
+
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filters', nargs='+', choices=list(FILTERS), default=list(FILTERS), metavar='FILTER')
+    parser.add_argument('--fixtures', nargs='+', default=FIXTURES, metavar='FIXTURE',
+                        help='like png-512, jpeg-1024 or gif-256x30 (size x frames)')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--numpy', action='store_true', help='use the NumPy backend for the filters the bot uses it for')
+    parser.add_argument('--output', default='benchmark-results.json', help='where to save the JSON results')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    options = parser.parse_args()
+
+    if options.numpy and image.np is None:
+        sys.exit('NumPy isn\'t installed')
+
+    previous = None
+    if options.compare:
+        with open(options.compare) as file:
+            previous = json.load(file)['results']
+
+    results = []
+
+    for filter_name in options.filters:
+        for fixture_name in options.fixtures:
+            # A new process per case, so one case's peak memory doesn't hide another's
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results.append(pool.submit(
+                    run_case, filter_name, fixture_name, options.runs, options.warmup, options.numpy
+                ).result())
+
+    print_results(results, previous)
+
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'numpy': image.np.__version__ if options.numpy else None,
+        'cpu': platform.processor() or platform.machine(),
+        'results': results
+    }
+
+    with open(options.output, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    print(f'\nSaved results to {options.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -107,6 +107,10 @@ class Games(commands.Cog, name="Games"):
         else:
             self.osu_api = None
 
+    async def cog_unload(self):
+        if self.osu_api:
+            await self.osu_api.close()
+
     @commands.cooldown(1, 5, commands.BucketType.user)
     @commands.command(aliases=["mc"])
     async def minecraft(self, ctx: utils.CustomContext, account):
@@ -1,38 +1,721 @@
+import asyncio
 import discord
+import functools
+import hashlib
 import io
+import itertools
+import multiprocessing
+import os
+import time
 import utils
 
+from collections import deque, Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
 from discord.ext import commands
-from PIL import Image, ImageOps, ImageFilter, ImageEnhance, UnidentifiedImageError, ImageDraw, ImageFont, ImageSequence
-from typing import Optional, List
+from loguru import logger
+from PIL import (
+    Image, ImageOps, ImageFilter, ImageEnhance, UnidentifiedImageError, ImageDraw, ImageFont, ImageSequence, ImageChops,
+    GifImagePlugin
+)
+from typing import Optional, List, Tuple, Dict, Deque, Iterator, Iterable, IO, Callable, Any, Collection
 
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional, without it every filter runs on Pillow
+    np = None
 
-def image_to_file(image: Image, extension) -> discord.File:
+
+# Encoder settings are picked with these, see encode_still and hande_gif_images
+PNG_OPTIMIZE_PIXELS = 128 * 128
+GIF_OPTIMIZE_PIXELS = 50 * 512 * 512
+WEBP_FALLBACKS = (
+    ('webp', {'quality': 90, 'method': 4}),
+    ('webp', {'quality': 75, 'method': 4})
+)
+DOWNSCALE_STEP = 0.75
+MAX_DOWNSCALES = 4
+
+EncodeTimings = List[Tuple[str, float]]
+
+
+def downscale_factor(size: int, max_bytes: int) -> float:
+    # Encoded size goes roughly with the pixel count, so this aims a bit under the budget in one step
+    return min(DOWNSCALE_STEP, 0.9 * (max_bytes / size) ** 0.5)
+
+
+def image_to_bytes(image: Image, extension: str, timings: EncodeTimings, **params) -> bytes:
     img_bytes = io.BytesIO()
-    image.save(img_bytes, extension, optimize=True)
 
-    img_bytes.seek(0)
+    start = time.perf_counter()
+    image.save(img_bytes, extension, **params)
+    timings.append((extension, time.perf_counter() - start))
 
-    return discord.File(img_bytes, f'image.{extension}')
+    return img_bytes.getvalue()
 
 
-def hande_gif_images(func, b: bytes, *args, **kwargs):
-    im = Image.open(io.BytesIO(b))
-    frames = []
-    new = io.BytesIO()
+@dataclass(frozen=True)
+class ImageLimits:
+    max_edge: int = 2048
+    max_pixels: int = 4096 * 4096
+    max_frames: int = 200
+    max_output_bytes: int = 10 * 1024 * 1024
+
+
+def preflight(im: Image, limits: ImageLimits):
+    """Checks an image using only its header, before any frames are decoded.
+    JPEGs are set up to decode at a smaller scale, other formats that are too large get rejected"""
 
-    for frame in ImageSequence.Iterator(im):
+    if im.format == 'JPEG':
+        # Makes the decoder skip pixels, instead of decoding at full size then resizing
+        im.draft('RGB', (limits.max_edge, limits.max_edge))
+
+    width, height = im.size
+
+    if width * height > limits.max_pixels:
+        raise utils.ImageTooLarge(f'The image is too large! ({width}x{height})')
+
+
+def decode_frames(im: Image, limits: ImageLimits) -> Iterator[Tuple[Image, Optional[int]]]:
+    """Decodes frames one at a time as RGBA, along with how long each one is shown"""
+
+    # Any frames past the limit are dropped
+    for frame in itertools.islice(ImageSequence.Iterator(im), limits.max_frames):
+        duration = frame.info.get('duration')
         frame = frame.convert('RGBA')
-        frame = func(frame, *args, **kwargs)
-        frames.append(frame)
 
-    if len(frames) == 1:
-        return image_to_file(frames[0], 'png')
+        if max(frame.size) > limits.max_edge:
+            frame.thumbnail((limits.max_edge, limits.max_edge))
+
+        yield frame, duration
+
+
+def batch_frames(frames: Iterable[Tuple[Image, Optional[int]]]) -> Iterator[List[Tuple[Image, Optional[int]]]]:
+    """Groups same sized frames together, up to NUMPY_BATCH_PIXELS pixels per group"""
+
+    batch = []
+    pixels = 0
+
+    for frame, duration in frames:
+        if batch and (frame.size != batch[0][0].size or pixels + frame.width * frame.height > NUMPY_BATCH_PIXELS):
+            yield batch
+            batch = []
+            pixels = 0
+
+        batch.append((frame, duration))
+        pixels += frame.width * frame.height
+
+    if batch:
+        yield batch
+
+
+def with_duration(frame: Image, duration: Optional[int]) -> Image:
+    # Filters usually return a new image, which would lose the source frame's timing
+    if duration is not None:
+        frame.info['duration'] = duration
+
+    return frame
+
+
+def transform_frames(
+        im: Image,
+        func,
+        args,
+        kwargs,
+        limits: ImageLimits,
+        numpy_filters: Collection[Callable] = ()
+) -> Iterator[Image]:
+    """Decodes, converts and transforms frames one at a time, so only the frame being worked on is held.
+    Filters in numpy_filters get small batches of frames stacked into one array and run their NumPy version instead"""
+
+    array_func = NUMPY_FILTERS.get(func) if func in numpy_filters and np is not None else None
+
+    if array_func is None:
+        for frame, duration in decode_frames(im, limits):
+            yield with_duration(func(frame, *args, **kwargs), duration)
+
+        return
+
+    for batch in batch_frames(decode_frames(im, limits)):
+        arrays = array_func(np.stack([np.asarray(frame) for frame, _ in batch]), *args, **kwargs)
+
+        for array, (_, duration) in zip(arrays, batch):
+            yield with_duration(Image.fromarray(array), duration)
+
+
+# write_gif streams frames with these private helpers of Pillow's GIF plugin (checked against the pinned 11.3.0).
+# If an upgrade drops them, GIFs are encoded with the public save_all instead, which buffers every frame
+GIF_HELPERS = all(
+    hasattr(GifImagePlugin, name)
+    for name in ('_normalize_mode', '_normalize_palette', '_get_global_header', '_write_frame_data')
+)
+
+
+def has_transparency(frame: Image) -> bool:
+    return frame.mode in ('RGBA', 'LA', 'PA') or 'transparency' in frame.info
+
+
+def changed_box(previous: Image, frame: Image) -> Optional[Tuple[int, int, int, int]]:
+    # Same as Pillow's GIF writer, the box around every pixel that differs from the previous frame
+    if previous.mode != frame.mode or frame.mode not in ('L', 'RGB', 'RGBA'):
+        previous, frame = previous.convert('RGBA'), frame.convert('RGBA')
+
+    return ImageChops.subtract_modulo(frame, previous).getbbox(alpha_only=False)
+
+
+def union(a: Tuple[int, int, int, int], b: Optional[Tuple[int, int, int, int]]) -> Tuple[int, int, int, int]:
+    if b is None:
+        return a
+
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def cleared_box(previous: Image, frame: Image) -> Optional[Tuple[int, int, int, int]]:
+    # Pixels that are more transparent than in the previous frame, drawing over it can't clear them
+    if not has_transparency(frame):
+        return None
+
+    alpha = frame.convert('RGBA').getchannel('A')
+    previous_alpha = previous.convert('RGBA').getchannel('A')
+
+    return ImageChops.subtract(previous_alpha, alpha).getbbox()
+
+
+def write_gif_frame(fp: IO[bytes], frame: Image, offset: Tuple[int, int], info: dict, loop: Optional[int]):
+    # Only the first frame is given loop, it goes in the header along with the first frame's palette
+    frame = GifImagePlugin._normalize_mode(frame)
+
+    if 'transparency' in frame.info:
+        info['transparency'] = frame.info['transparency']
+
+    frame = GifImagePlugin._normalize_palette(frame, None, info)
+
+    if loop is not None:
+        for block in GifImagePlugin._get_global_header(frame, {**info, 'loop': loop}):
+            fp.write(block)
+    else:
+        info['include_color_table'] = True
+
+    GifImagePlugin._write_frame_data(fp, frame, offset, info)
+
+
+def save_gif(frames: Iterable[Image], fp: IO[bytes], loop: int, optimize: bool) -> Tuple[float, int]:
+    frames = list(frames)
+
+    start = time.perf_counter()
+    frames[0].save(
+        fp,
+        'GIF',
+        save_all=True,
+        append_images=frames[1:],
+        loop=loop,
+        optimize=optimize,
+        duration=[frame.info.get('duration', 0) for frame in frames],
+        disposal=2
+    )
+
+    return time.perf_counter() - start, len(frames)
+
+
+def write_gif(
+        frames: Iterable[Image],
+        fp: IO[bytes],
+        loop: int = 0,
+        optimize: bool = True,
+        max_bytes: Optional[int] = None
+) -> Tuple[float, int]:
+    """Encodes frames into a GIF as they come in, and returns the seconds spent encoding and the frames written.
+    Pillow's append_images keeps every frame in memory until the end, so this writes each frame out
+    with its own palette using Pillow's GIF helpers, and only holds on to the last frame.
+    Like Pillow, only the box that changed since the previous frame is written, and frames that didn't change
+    make the previous one last longer. A frame is held back until the next one comes in, since that decides
+    whether it can be drawn over or has to be cleared first.
+    Stops early once more than max_bytes have been written, so the caller should check the size"""
+
+    if not GIF_HELPERS:
+        return save_gif(frames, fp, loop, optimize)
+
+    elapsed = 0.0
+    written = 0
+    previous = None
+    # The frame waiting to be written: the image, its offset, its info, and how many input frames it stands for
+    pending = None
+
+    for frame in frames:
+        start = time.perf_counter()
+
+        info = {'optimize': optimize, 'duration': frame.info.get('duration', 0), 'disposal': 2}
+        box = (0, 0) + frame.size
+
+        if previous is not None and previous.size == frame.size:
+            changed = changed_box(previous, frame)
+
+            if changed is None:
+                pending[2]['duration'] += info['duration']
+                pending[3] += 1
+                elapsed += time.perf_counter() - start
+                continue
+
+            cleared = cleared_box(previous, frame)
+
+            if cleared is not None:
+                # The pending frame is grown to cover the cleared pixels and cleared after it's shown,
+                # so this frame has to draw whatever it shows in that box again
+                left, top = pending[1]
+                disposed = union(cleared, (left, top, left + pending[0].width, top + pending[0].height))
+                pending[0] = previous.crop(disposed)
+                pending[1] = disposed[:2]
+
+                shown = frame.convert('RGBA').getchannel('A').crop(disposed).getbbox()
+                if shown is not None:
+                    left, top = disposed[:2]
+                    shown = (shown[0] + left, shown[1] + top, shown[2] + left, shown[3] + top)
+
+                box = union(changed, shown)
+            else:
+                pending[2]['disposal'] = 1
+                box = changed
+
+        if pending is not None:
+            write_gif_frame(fp, pending[0], pending[1], pending[2], loop if not written else None)
+            written += pending[3]
+
+        pending = [frame.crop(box) if box != (0, 0) + frame.size else frame, box[:2], info, 1]
+        previous = frame
+
+        elapsed += time.perf_counter() - start
 
-    frames[0].save(new, 'gif', append_images=frames[1:], save_all=True)
-    new.seek(0)
+        if max_bytes is not None and fp.tell() > max_bytes:
+            return elapsed, written
 
-    return discord.File(new, 'image.gif')
+    if pending is not None:
+        start = time.perf_counter()
+        write_gif_frame(fp, pending[0], pending[1], pending[2], loop if not written else None)
+        written += pending[3]
+        elapsed += time.perf_counter() - start
+
+    fp.write(b';')
+
+    return elapsed, written
+
+
+def encode_still(image: Image, max_bytes: int) -> Tuple[bytes, str, EncodeTimings]:
+    """Encodes a single image in the first format that fits in max_bytes. PNG is tried first since it's lossless,
+    then lossy WebP, then lossy WebP at smaller and smaller sizes"""
+
+    timings = []
+
+    # The optimize pass takes 5-10x as long as the default level for a few percent smaller output,
+    # so it's only worth it for emote sized images
+    if image.width * image.height <= PNG_OPTIMIZE_PIXELS:
+        attempts = [('png', {'optimize': True})]
+    else:
+        attempts = [('png', {'compress_level': 6})]
+
+    for extension, params in attempts + list(WEBP_FALLBACKS):
+        data = image_to_bytes(image, extension, timings, **params)
+
+        if len(data) <= max_bytes:
+            return data, f'image.{extension}', timings
+
+    extension, params = WEBP_FALLBACKS[-1]
+
+    for _ in range(MAX_DOWNSCALES):
+        factor = downscale_factor(len(data), max_bytes)
+        size = (max(1, int(image.width * factor)), max(1, int(image.height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+        data = image_to_bytes(image, extension, timings, **params)
+
+        if len(data) <= max_bytes:
+            return data, f'image.{extension}', timings
+
+    raise utils.ImageTooLarge('The result is too large to upload, even after shrinking it!')
+
+
+def hande_gif_images(
+        func,
+        b: bytes,
+        *args,
+        limits: ImageLimits = ImageLimits(),
+        numpy_filters: Collection[Callable] = (),
+        **kwargs
+) -> Tuple[bytes, str, EncodeTimings]:
+    im = Image.open(io.BytesIO(b))
+
+    preflight(im, limits)
+
+    frames = transform_frames(im, func, args, kwargs, limits, numpy_filters)
+    first = next(frames)
+    second = next(frames, None)
+
+    if second is None:
+        return encode_still(first, limits.max_output_bytes)
+
+    frame_count = min(getattr(im, 'n_frames', 1), limits.max_frames)
+    optimize = frame_count * first.width * first.height <= GIF_OPTIMIZE_PIXELS
+
+    frames = itertools.chain((first, second), frames)
+    edge = min(max(im.size), limits.max_edge)
+    timings = []
+
+    for _ in range(MAX_DOWNSCALES + 1):
+        new = io.BytesIO()
+        elapsed, written = write_gif(frames, new, im.info.get('loop', 0), optimize, limits.max_output_bytes)
+        timings.append(('gif', elapsed))
+
+        if new.tell() <= limits.max_output_bytes:
+            return new.getvalue(), 'image.gif', timings
+
+        # Too big to upload, so the frames are made again at a smaller size.
+        # Writing stopped early, so the full size is guessed from the frames that were written
+        estimated_size = new.tell() * frame_count // written
+        edge = max(1, int(edge * downscale_factor(estimated_size, limits.max_output_bytes)))
+        frames = transform_frames(im, func, args, kwargs, replace(limits, max_edge=edge), numpy_filters)
+
+    raise utils.ImageTooLarge('The result is too large to upload, even after shrinking it!')
+
+
+def warm_worker():
+    # Loads all of Pillow's plugins, so the first real job doesn't have to
+    Image.init()
+
+    # The default flag at every common avatar size, about 5.3 MiB. Other flags are made when they're first used
+    for size in COMMON_AVATAR_SIZES:
+        cached_mask(FLAG_COLORS['pride'], size, size)
+
+
+class ImageEngine:
+    """Runs image functions in a pool of worker processes, so they can use every core without holding
+    the bot process's GIL. Only the input bytes and the encoded output are sent between processes"""
+
+    def __init__(self, workers: int, limits: ImageLimits = ImageLimits(), numpy_filters: Collection[Callable] = ()):
+        self.workers = workers
+        self.limits = limits
+        self.numpy_filters = frozenset(numpy_filters)
+
+        if self.numpy_filters and np is None:
+            logger.info('NumPy isn\'t installed, image filters will only use Pillow')
+            self.numpy_filters = frozenset()
+        self._pool = self._make_pool()
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    def _make_pool(self) -> ProcessPoolExecutor:
+        # Forking a process that has threads running isn't safe, so workers are spawned fresh.
+        # Every worker warms itself when it starts, including ones that replace a worker that died
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=warm_worker
+        )
+
+    async def warm_up(self):
+        """Starts every worker process ahead of time"""
+        loop = asyncio.get_running_loop()
+
+        try:
+            # The pool spawns a new process for every job submitted while none are idle,
+            # so this starts all of them, and each one runs warm_worker before its first job
+            await asyncio.gather(*(loop.run_in_executor(self._pool, os.getpid) for _ in range(self.workers)))
+        except BrokenProcessPool:
+            # The next job that runs finds the broken pool and replaces it
+            logger.warning('Image worker pool broke while warming up')
+
+    async def run(self, func, image_bytes: bytes, *args) -> Tuple[bytes, str]:
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+
+        try:
+            data, filename, timings = await loop.run_in_executor(
+                pool,
+                functools.partial(
+                    hande_gif_images, func, image_bytes, *args, limits=self.limits, numpy_filters=self.numpy_filters
+                )
+            )
+        except BrokenProcessPool:
+            # A worker died (most likely ran out of memory), so start over with a new pool for the next jobs.
+            # Every job on the broken pool fails at once, only the first one to get here replaces it
+            if self._pool is pool:
+                logger.warning('Image worker pool broke, restarting it')
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._make_pool()
+                self._warm_up_task = asyncio.create_task(self.warm_up())
+            raise
+
+        for extension, seconds in timings:
+            utils.IMAGE_ENCODE_SECONDS.labels(extension).observe(seconds)
+
+        return data, filename
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ImageBusy(commands.CommandError):
+    pass
+
+
+@dataclass(eq=False)
+class ImageJob:
+    user_id: int
+    guild_id: Optional[int]
+    ready: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class ImageJobScheduler:
+    """Decides which image jobs get to run on the engine. Caps how many jobs run at once globally and per guild,
+    and takes turns between users with waiting jobs, so one user spamming commands can't starve everyone else"""
+
+    def __init__(
+            self,
+            engine: ImageEngine,
+            *,
+            max_running: int,
+            max_per_guild: int,
+            max_queued: int,
+            max_user_queued: int
+    ):
+        self.engine = engine
+        self.max_running = max_running
+        self.max_per_guild = max_per_guild
+        self.max_queued = max_queued
+        self.max_user_queued = max_user_queued
+
+        self._queues: Dict[int, Deque[ImageJob]] = {}
+        self._turns: Deque[int] = deque()
+        self._queued = 0
+        self._running = 0
+        self._running_per_guild: Counter = Counter()
+
+    def _can_start(self, job: ImageJob) -> bool:
+        return job.guild_id is None or self._running_per_guild[job.guild_id] < self.max_per_guild
+
+    def _start(self, job: ImageJob):
+        self._running += 1
+        if job.guild_id is not None:
+            self._running_per_guild[job.guild_id] += 1
+
+        job.ready.set_result(None)
+
+    def _finish(self, job: ImageJob):
+        self._running -= 1
+        if job.guild_id is not None:
+            self._running_per_guild[job.guild_id] -= 1
+            if not self._running_per_guild[job.guild_id]:
+                del self._running_per_guild[job.guild_id]
+
+    def _remove_queued(self, job: ImageJob):
+        queue = self._queues.get(job.user_id)
+
+        if queue is None or job not in queue:
+            return
+
+        queue.remove(job)
+        self._queued -= 1
+
+        if not queue:
+            del self._queues[job.user_id]
+            self._turns.remove(job.user_id)
+
+    def _dispatch(self):
+        while self._running < self.max_running and self._turns:
+            # Go around the users with waiting jobs once, starting the first job that is allowed to run
+            for _ in range(len(self._turns)):
+                user_id = self._turns.popleft()
+                queue = self._queues[user_id]
+                job = queue[0]
+
+                if job.ready.cancelled() or self._can_start(job):
+                    queue.popleft()
+                    self._queued -= 1
+
+                    if queue:
+                        self._turns.append(user_id)
+                    else:
+                        del self._queues[user_id]
+
+                    if not job.ready.cancelled():
+                        self._start(job)
+                    break
+
+                self._turns.append(user_id)
+            else:
+                # Every waiting job is in a guild that is already at its limit
+                break
+
+        utils.IMAGE_JOBS_QUEUED.set(self._queued)
+        utils.IMAGE_JOBS_RUNNING.set(self._running)
+
+    async def submit(self, ctx: utils.CustomContext, func, image_bytes: bytes, *args) -> Tuple[bytes, str]:
+        # Checked first, so someone spamming commands gets their own jobs turned away before they fill the queue
+        if len(self._queues.get(ctx.author.id, ())) >= self.max_user_queued:
+            utils.IMAGE_JOBS_REJECTED.labels('user_limit').inc()
+            raise ImageBusy('You already have images waiting to be made, wait for them to finish first!')
+
+        if self._queued >= self.max_queued:
+            utils.IMAGE_JOBS_REJECTED.labels('queue_full').inc()
+            raise ImageBusy('Too many images are being made right now, try again in a bit!')
+
+        job = ImageJob(ctx.author.id, ctx.guild.id if ctx.guild else None)
+
+        if job.user_id not in self._queues:
+            self._queues[job.user_id] = deque()
+            self._turns.append(job.user_id)
+
+        self._queues[job.user_id].append(job)
+        self._queued += 1
+
+        queued_at = time.monotonic()
+        self._dispatch()
+
+        try:
+            # If this gets cancelled while waiting, the job is skipped once its turn comes
+            await job.ready
+        except asyncio.CancelledError:
+            if job.ready.cancelled():
+                # Cancelled while waiting, so it stops counting against the queue straight away
+                self._remove_queued(job)
+            else:
+                # Cancelled after the job was started but before it got to run, so its slot has to be given back
+                self._finish(job)
+
+            self._dispatch()
+            raise
+
+        utils.IMAGE_JOB_WAIT.observe(time.monotonic() - queued_at)
+
+        try:
+            return await self.engine.run(func, image_bytes, *args)
+        finally:
+            self._finish(job)
+            self._dispatch()
+
+
+class ImageResultCache:
+    """Keeps the output of image jobs, keyed by a hash of the input image, the filter and its arguments.
+    The most recently used results are kept in memory up to a byte budget, and optionally on disk as well"""
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.directory = directory if max_disk_bytes else None
+        self.max_disk_bytes = max_disk_bytes
+
+        self._entries: OrderedDict[str, Tuple[bytes, str]] = OrderedDict()
+        self._size = 0
+        # Maps keys to the name and size of their file, oldest first
+        self._files: OrderedDict[str, Tuple[str, int]] = OrderedDict()
+        self._disk_size = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with os.scandir(self.directory) as entries:
+                files = sorted(
+                    (entry for entry in entries if entry.is_file() and not entry.name.endswith('.tmp')),
+                    key=lambda e: e.stat().st_mtime
+                )
+
+            for entry in files:
+                key = entry.name.rpartition('.')[0]
+                self._files[key] = (entry.name, entry.stat().st_size)
+                self._disk_size += entry.stat().st_size
+
+    @staticmethod
+    def key(func, image_bytes: bytes, args: tuple) -> str:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        params = hashlib.sha256(repr(args).encode()).hexdigest()[:16]
+
+        return f'{digest}-{func.__name__}-{params}'
+
+    def _remember(self, key: str, result: Tuple[bytes, str]):
+        size = len(result[0])
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key)[0])
+
+        self._entries[key] = result
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, (data, _) = self._entries.popitem(last=False)
+            self._size -= len(data)
+
+        utils.IMAGE_CACHE_BYTES.labels('memory').set(self._size)
+
+    def _read_file(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, name), 'rb') as file:
+            return file.read()
+
+    def _write_file(self, name: str, data: bytes, evicted: List[str]):
+        path = os.path.join(self.directory, name)
+
+        # Written under a temporary name first, so a half written file is never read
+        with open(f'{path}.tmp', 'wb') as file:
+            file.write(data)
+        os.replace(f'{path}.tmp', path)
+
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        result = self._entries.get(key)
+
+        if result is not None:
+            self._entries.move_to_end(key)
+            utils.IMAGE_CACHE_LOOKUPS.labels('memory').inc()
+            return result
+
+        if key in self._files:
+            name, _ = self._files[key]
+            self._files.move_to_end(key)
+
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, self._read_file, name)
+            except FileNotFoundError:
+                # Removed by an eviction that happened while this was waiting
+                utils.IMAGE_CACHE_LOOKUPS.labels('miss').inc()
+                return None
+
+            result = data, f'image.{name.rpartition(".")[2]}'
+            self._remember(key, result)
+
+            utils.IMAGE_CACHE_LOOKUPS.labels('disk').inc()
+            return result
+
+        utils.IMAGE_CACHE_LOOKUPS.labels('miss').inc()
+        return None
+
+    async def put(self, key: str, result: Tuple[bytes, str]):
+        self._remember(key, result)
+
+        data, filename = result
+        if not self.directory or len(data) > self.max_disk_bytes or key in self._files:
+            return
+
+        name = f'{key}.{filename.rpartition(".")[2]}'
+        self._files[key] = (name, len(data))
+        self._disk_size += len(data)
+
+        evicted = []
+        while self._disk_size > self.max_disk_bytes:
+            _, (old_name, old_size) = self._files.popitem(last=False)
+            self._disk_size -= old_size
+            evicted.append(old_name)
+
+        utils.IMAGE_CACHE_BYTES.labels('disk').set(self._disk_size)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_file, name, data, evicted)
+        except OSError as e:
+            logger.warning(f'Could not write image cache file {name}: {e}')
+            if self._files.pop(key, None):
+                self._disk_size -= len(data)
 
 
 def invert_image(image: Image):
@@ -103,6 +786,49 @@ def rotate_image(image: Image, angle: int):
 
     return image
 
+
+FLAG_COLORS: Dict[str, Tuple[Tuple[int, int, int], ...]] = {
+    'pride': ((255, 0, 24), (255, 165, 44), (255, 255, 65), (0, 128, 24), (0, 0, 249), (134, 0, 125)),
+    'gay': (
+        (7, 141, 112),
+        (38, 206, 170),
+        (153, 232, 194),
+        (255, 255, 255),
+        (123, 173, 227),
+        (80, 73, 203),
+        (62, 26, 120)
+    ),
+    'transgender': ((91, 206, 250), (245, 169, 184), (255, 255, 255), (245, 169, 184), (91, 206, 250)),
+    'bisexual': ((216, 9, 126), (216, 9, 126), (140, 87, 156), (36, 70, 142), (36, 70, 142)),
+    'lesbian': (
+        (213, 45, 0),
+        (239, 118, 39),
+        (255, 154, 86),
+        (255, 255, 255),
+        (209, 98, 164),
+        (181, 86, 144),
+        (163, 2, 98)
+    ),
+    'asexual': ((0, 0, 0), (164, 164, 164), (255, 255, 255), (129, 0, 129)),
+    'pansexual': ((255, 28, 141), (255, 215, 0), (26, 179, 255)),
+    'nonbinary': ((255, 244, 48), (255, 255, 255), (156, 89, 209), (0, 0, 0)),
+    'gnc': (
+        (80, 40, 76),
+        (150, 71, 122),
+        (93, 150, 247),
+        (255, 255, 255),
+        (93, 150, 247),
+        (150, 71, 122),
+        (80, 40, 76)
+    ),
+    'aromantic': ((58, 166, 63), (168, 212, 122), (255, 255, 255), (170, 170, 170), (0, 0, 0)),
+    'genderqueer': ((181, 126, 220), (255, 255, 255), (73, 128, 34))
+}
+
+# The sizes avatars and emotes usually come in, flag masks for them are made when the image workers start
+COMMON_AVATAR_SIZES = (128, 256, 512, 1024)
+
+
 def make_mask(colors, width, height):
     color_height = height / len(colors)
 
@@ -123,14 +849,143 @@ def make_mask(colors, width, height):
     return color_image
 
 
+class MaskCache:
+    """Keeps the most recently used flag masks of a worker up to a byte budget. An RGBA mask takes
+    4 bytes a pixel, so a count limit would let a few large masks take far more memory than many small ones"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+        self._masks: OrderedDict[tuple, Image] = OrderedDict()
+        self._size = 0
+
+    def get(self, colors: Tuple[Tuple[int, int, int], ...], width: int, height: int) -> Image:
+        key = (colors, width, height)
+        mask = self._masks.get(key)
+
+        if mask is not None:
+            self._masks.move_to_end(key)
+            return mask
+
+        mask = make_mask(colors, width, height)
+        size = width * height * 4
+
+        if size > self.max_bytes:
+            return mask
+
+        self._masks[key] = mask
+        self._size += size
+
+        while self._size > self.max_bytes:
+            (_, old_width, old_height), _ = self._masks.popitem(last=False)
+            self._size -= old_width * old_height * 4
+
+        return mask
+
+
+# Four 1024px masks, or many more at the smaller avatar sizes
+MASKS = MaskCache(16 * 1024 * 1024)
+
+
+def cached_mask(colors: Tuple[Tuple[int, int, int], ...], width: int, height: int) -> Image:
+    # Image.blend doesn't change its inputs, so one mask is shared by every frame and request of the same size
+    return MASKS.get(colors, width, height)
+
+
 def make_flag(image: Image, alpha: float, colors: List):
-    mask = make_mask(colors, *image.size)
+    mask = cached_mask(tuple(colors), *image.size)
     blended_image = Image.blend(image, mask, alpha)
 
     return blended_image
 
 
-async def pride_flag(ctx: utils.CustomContext, image: Optional[bytes], transparency: int, colors: List):
+# NumPy versions of some filters. They take a stack of RGBA frames shaped (frames, height, width, 4),
+# so a batch of GIF frames gets filtered in one go
+
+def blend_arrays(frames, other, alpha: float):
+    # Same as Image.blend, other gets broadcast over the frames
+    blended = frames.astype(np.float32)
+    blended += (other - blended) * alpha
+
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+
+def noise_array(shape):
+    # Grey gaussian noise around 128, like Image.effect_noise(size, 20)
+    noise = np.random.default_rng().normal(128, 20, shape).astype(np.float32)
+
+    return np.clip(noise, 0, 255)[..., np.newaxis]
+
+
+def web_palette_array(frames):
+    # Snaps colors to the 6x6x6 web palette, which is what convert('P') uses, without dithering
+    return np.round(frames / 51) * 51
+
+
+def invert_frames(frames):
+    inverted = frames.copy()
+    np.subtract(255, frames[..., :3], out=inverted[..., :3])
+
+    return inverted
+
+
+def noise_frames(frames, alpha: float):
+    noise = np.empty(frames.shape, np.float32)
+    noise[..., :3] = noise_array(frames.shape[:-1])
+    noise[..., 3] = 255
+
+    return blend_arrays(frames, noise, alpha)
+
+
+@functools.lru_cache(maxsize=256)
+def flag_stripes(colors: Tuple[Tuple[int, int, int], ...], height: int):
+    # Each stripe starts on the row make_mask would start drawing it
+    starts = (np.arange(len(colors)) * (height / len(colors))).astype(int)
+    rows = np.searchsorted(starts, np.arange(height), side='right') - 1
+    stripes = np.array([(*color, 255) for color in colors], np.float32)
+
+    # One color per row, broadcast over the width. Shared between calls, so it's made read-only
+    mask = stripes[rows][:, np.newaxis, :]
+    mask.flags.writeable = False
+
+    return mask
+
+
+def flag_frames(frames, alpha: float, colors: List):
+    return blend_arrays(frames, flag_stripes(tuple(colors), frames.shape[-3]), alpha)
+
+
+def deepfry_frames(frames):
+    image = web_palette_array(frames[..., :3].astype(np.float32))
+
+    image = np.clip(image * 1.1, 0, 255)
+
+    # Contrast is centered on each frame's own mean grey level, like ImageEnhance.Contrast
+    grey = image @ np.array([0.299, 0.587, 0.114], np.float32)
+    mean = np.floor(grey.mean(axis=(-2, -1), keepdims=True) + 0.5)[..., np.newaxis]
+    image = np.clip(mean + (image - mean) * 10, 0, 255)
+
+    image += (noise_array(image.shape[:-1]) - image) * 0.25
+
+    return web_palette_array(np.clip(image, 0, 255)).astype(np.uint8)
+
+
+NUMPY_FILTERS = {
+    invert_image: invert_frames,
+    noise_image: noise_frames,
+    make_flag: flag_frames,
+    deepfry_image: deepfry_frames
+}
+
+# Only deepfry is faster on NumPy, it skips Pillow's dithered palette conversions. The others are already cheap
+# on Pillow and lose time converting to and from arrays, see benchmarks/image_backends.py
+NUMPY_DEFAULT_FILTERS = frozenset({deepfry_image})
+
+# Pixels per batch of frames, which keeps the float arrays made while filtering at around 64 MiB
+NUMPY_BATCH_PIXELS = 2048 * 2048
+
+
+async def pride_flag(ctx: utils.CustomContext, image: Optional[bytes], transparency: int, colors: Tuple):
     if not 0 < transparency <= 100:
         raise commands.BadArgument('Transparency should be in between 0 and 100')
 
@@ -141,7 +996,7 @@ async def pride_flag(ctx: utils.CustomContext, image: Optional[bytes], transpare
     else:
         image_bytes = image
 
-    file = await ctx.bot.loop.run_in_executor(None, hande_gif_images, make_flag, image_bytes, transparency, colors)
+    file = await ctx.cog.render(ctx, make_flag, image_bytes, transparency, colors)
 
     embed = utils.create_embed(
         ctx.author,
@@ -152,6 +1007,11 @@ async def pride_flag(ctx: utils.CustomContext, image: Optional[bytes], transpare
     await ctx.send(embed=embed, file=file)
 
 
+@functools.lru_cache(maxsize=64)
+def impact_font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype('assets/impact.ttf', size)
+
+
 def add_impact(image: Image, top_text: str, bottom_text: str):
     top_text = top_text.upper()
     bottom_text = bottom_text.upper() if bottom_text else None
@@ -160,7 +1020,7 @@ def add_impact(image: Image, top_text: str, bottom_text: str):
         height = int(256 * (image.height / image.width))
         image = image.resize((256, height))
 
-    impact = ImageFont.truetype('assets/impact.ttf', image.width // 10)
+    impact = impact_font(image.width // 10)
     canvas = ImageDraw.Draw(image)
 
     xpos = image.width / 2
@@ -191,11 +1051,152 @@ def add_impact(image: Image, top_text: str, bottom_text: str):
     return image
 
 
+def parse_radius(argument: str) -> int:
+    return abs(int(argument))
+
+
+def parse_strength(argument: str) -> float:
+    strength = float(argument)
+
+    if not 0 < strength <= 100:
+        raise commands.BadArgument('Noise strength should be in between 0 and 100')
+
+    return strength / 100
+
+
+def parse_intensity(argument: str) -> float:
+    intensity = float(argument)
+
+    if not 0 < intensity:
+        raise commands.BadArgument('Brightness and contrast strength should be more than zero!')
+
+    return intensity
+
+
+@dataclass(frozen=True)
+class PipelineStep:
+    func: Callable
+    parse: Optional[Callable[[str], Any]] = None
+    default: Optional[str] = None
+
+
+# Only step names and parsed arguments are sent to the image workers, which look the functions up here
+PIPELINE_STEPS: Dict[str, PipelineStep] = {
+    'invert': PipelineStep(invert_image),
+    'greyscale': PipelineStep(greyscale_image),
+    'deepfry': PipelineStep(deepfry_image),
+    'blur': PipelineStep(blur_image, parse_radius, '5'),
+    'noise': PipelineStep(noise_image, parse_strength, '50'),
+    'brighten': PipelineStep(brighten_image, parse_intensity, '1.25'),
+    'contrast': PipelineStep(contrast_image, parse_intensity, '1.25'),
+    'rotate': PipelineStep(rotate_image, int, '90')
+}
+
+PIPELINE_ALIASES = {
+    'grayscale': 'greyscale',
+    'grey': 'greyscale',
+    'gray': 'greyscale',
+    'fry': 'deepfry',
+    'blurry': 'blur',
+    'noisy': 'noise',
+    'bright': 'brighten',
+    'brightness': 'brighten'
+}
+
+MAX_PIPELINE_STEPS = 10
+
+
+def parse_pipeline(arguments: Iterable[str]) -> Tuple[Tuple[str, tuple], ...]:
+    """Turns arguments like `blur:3 contrast invert` into steps for apply_steps"""
+
+    steps = []
+
+    for argument in arguments:
+        name, _, value = argument.lower().partition(':')
+        name = PIPELINE_ALIASES.get(name, name)
+
+        if name not in PIPELINE_STEPS:
+            raise commands.BadArgument(f'Unknown step `{name}`, available steps: {", ".join(PIPELINE_STEPS)}')
+
+        step = PIPELINE_STEPS[name]
+
+        if not step.parse:
+            steps.append((name, ()))
+            continue
+
+        try:
+            steps.append((name, (step.parse(value or step.default),)))
+        except ValueError:
+            raise commands.BadArgument(f'`{value}` isn\'t a valid value for `{name}`')
+
+    if not steps:
+        raise commands.BadArgument('Specify at least one step!')
+
+    if len(steps) > MAX_PIPELINE_STEPS:
+        raise commands.BadArgument(f'A pipeline can have at most {MAX_PIPELINE_STEPS} steps')
+
+    return tuple(steps)
+
+
+def apply_steps(image: Image, steps: Tuple[Tuple[str, tuple], ...]):
+    """Runs every step on a frame in order, so a chain of filters only decodes and encodes the image once"""
+
+    for name, args in steps:
+        # Some steps change the mode, but every step expects RGBA like a freshly decoded frame
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+
+        image = PIPELINE_STEPS[name].func(image, *args)
+
+    return image
+
+
 class Images(commands.Cog):
     """Commands for image manipulation!"""
 
     def __init__(self, bot):
         self.bot: utils.CustomBot = bot
+        self.engine: ImageEngine = ImageEngine(
+            int(bot.config['image_workers']),
+            ImageLimits(
+                max_edge=int(bot.config['image_max_edge']),
+                max_pixels=int(bot.config['image_max_pixels']),
+                max_frames=int(bot.config['image_max_frames']),
+                max_output_bytes=int(bot.config['image_max_output_bytes'])
+            ),
+            numpy_filters=NUMPY_DEFAULT_FILTERS if bot.config['image_backend'] == 'numpy' else ()
+        )
+        self.jobs: ImageJobScheduler = ImageJobScheduler(
+            self.engine,
+            max_running=int(bot.config['image_max_jobs']),
+            max_per_guild=int(bot.config['image_max_guild_jobs']),
+            max_queued=int(bot.config['image_max_queued']),
+            max_user_queued=int(bot.config['image_max_user_queued'])
+        )
+        self.cache: ImageResultCache = ImageResultCache(
+            int(bot.config['image_cache_bytes']),
+            os.path.join(bot.config['data_dir'], 'image_cache'),
+            int(bot.config['image_cache_disk_bytes'])
+        )
+
+    async def cog_load(self):
+        self._warm_up_task = asyncio.create_task(self.engine.warm_up())
+
+    async def cog_unload(self):
+        self.engine.shutdown()
+
+    async def render(self, ctx: utils.CustomContext, func, image_bytes: bytes, *args) -> discord.File:
+        """Runs an image function through the job scheduler, unless the same job's result is already cached"""
+
+        key = self.cache.key(func, image_bytes, args)
+        result = await self.cache.get(key)
+
+        if result is None:
+            result = await self.jobs.submit(ctx, func, image_bytes, *args)
+            await self.cache.put(key, result)
+
+        data, filename = result
+        return discord.File(io.BytesIO(data), filename)
 
     @commands.command()
     async def invert(self, ctx: utils.CustomContext, *, image: Optional[str]):
@@ -219,7 +1220,7 @@ class Images(commands.Cog):
         # Use converter here so that it triggers even without given argument
         image_bytes = await utils.ImageConverter().convert(ctx, image)
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, invert_image, image_bytes)
+        file = await self.render(ctx, invert_image, image_bytes)
 
         embed = utils.create_embed(
             ctx.author,
@@ -253,7 +1254,7 @@ class Images(commands.Cog):
         # Use converter here so that it triggers even without given argument
         image_bytes = await utils.ImageConverter().convert(ctx, image)
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, greyscale_image, image_bytes)
+        file = await self.render(ctx, greyscale_image, image_bytes)
 
         embed = utils.create_embed(
             ctx.author,
@@ -285,7 +1286,7 @@ class Images(commands.Cog):
         # Use converter here so that it triggers even without given argument
         image_bytes = await utils.ImageConverter().convert(ctx, image)
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, deepfry_image, image_bytes)
+        file = await self.render(ctx, deepfry_image, image_bytes)
 
         embed = utils.create_embed(
             ctx.author,
@@ -319,7 +1320,7 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, blur_image, image_bytes, abs(strength))
+        file = await self.render(ctx, blur_image, image_bytes, abs(strength))
 
         embed = utils.create_embed(
             ctx.author,
@@ -358,7 +1359,7 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, noise_image, image_bytes, strength)
+        file = await self.render(ctx, noise_image, image_bytes, strength)
 
         embed = utils.create_embed(
             ctx.author,
@@ -395,7 +1396,7 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, brighten_image, image_bytes, strength)
+        file = await self.render(ctx, brighten_image, image_bytes, strength)
 
         embed = utils.create_embed(
             ctx.author,
@@ -432,7 +1433,7 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, contrast_image, image_bytes, strength)
+        file = await self.render(ctx, contrast_image, image_bytes, strength)
 
         embed = utils.create_embed(
             ctx.author,
@@ -472,14 +1473,7 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(
-            None,
-            hande_gif_images,
-            add_impact,
-            image_bytes,
-            top_text,
-            bottom_text
-        )
+        file = await self.render(ctx, add_impact, image_bytes, top_text, bottom_text)
 
         embed = utils.create_embed(
             ctx.author,
@@ -513,7 +1507,47 @@ class Images(commands.Cog):
         else:
             image_bytes = image
 
-        file = await self.bot.loop.run_in_executor(None, hande_gif_images, rotate_image, image_bytes, angle)
+        file = await self.render(ctx, rotate_image, image_bytes, angle)
+
+        embed = utils.create_embed(
+            ctx.author,
+            title=f'Here\'s your modified image:',
+            image=f'attachment://{file.filename}'
+        )
+
+        await ctx.send(embed=embed, file=file)
+
+    @commands.command(aliases=['chain'])
+    async def pipeline(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], *steps: str):
+        """Applies several filters to an image in order, for example `pipeline blur:3 contrast:2 invert`
+
+        **Steps:**
+        invert, greyscale, deepfry, blur:radius, noise:strength, brighten:strength, contrast:strength, rotate:angle
+        Leaving out the value uses the same default as the filter's own command
+
+        **Steps for getting image:**
+        1. Replied message -> Message steps
+        2. Specified message -> Message steps
+        3. Command's message -> Message steps
+        4. Invoker's avatar
+
+        **Message steps:**
+        1. Attachment
+        2. Sticker
+        3. Embed image/thumbnail
+        3. Specified user
+        4. Specified emote
+        5. Specified link
+        """
+
+        pipeline_steps = parse_pipeline(steps)
+
+        if not image:
+            image_bytes = await utils.ImageConverter().convert(ctx, image)
+        else:
+            image_bytes = image
+
+        file = await self.render(ctx, apply_steps, image_bytes, pipeline_steps)
 
         embed = utils.create_embed(
             ctx.author,
@@ -542,9 +1576,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        pride_colors = [(255, 0, 24), (255, 165, 44), (255, 255, 65), (0, 128, 24), (0, 0, 249), (134, 0, 125)]
-
-        await pride_flag(ctx, image, transparency, pride_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['pride'])
 
     @commands.command(aliases=['homo', 'homosexual'])
     async def gay(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -565,17 +1597,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        gay_colors = [
-            (7, 141, 112),
-            (38, 206, 170),
-            (153, 232, 194),
-            (255, 255, 255),
-            (123, 173, 227),
-            (80, 73, 203),
-            (62, 26, 120)
-        ]
-
-        await pride_flag(ctx, image, transparency, gay_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['gay'])
 
     @commands.command(aliases=['trans'])
     async def transgender(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -596,9 +1618,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        trans_colors = [(91, 206, 250), (245, 169, 184), (255, 255, 255), (245, 169, 184), (91, 206, 250)]
-
-        await pride_flag(ctx, image, transparency, trans_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['transgender'])
 
     @commands.command(aliases=['bi'])
     async def bisexual(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -619,9 +1639,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        bi_colors = [(216, 9, 126), (216, 9, 126), (140, 87, 156), (36, 70, 142), (36, 70, 142)]
-
-        await pride_flag(ctx, image, transparency, bi_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['bisexual'])
 
     @commands.command(aliases=['lesb'])
     async def lesbian(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -642,11 +1660,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        lesbian_colors = [
-            (213, 45, 0), (239, 118, 39), (255, 154, 86), (255, 255, 255), (209, 98, 164), (181, 86, 144), (163, 2, 98)
-        ]
-
-        await pride_flag(ctx, image, transparency, lesbian_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['lesbian'])
 
     @commands.command(aliases=['ace'])
     async def asexual(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -667,9 +1681,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        ace_colors = [(0, 0, 0), (164, 164, 164), (255, 255, 255), (129, 0, 129)]
-
-        await pride_flag(ctx, image, transparency, ace_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['asexual'])
 
     @commands.command(aliases=['pan'])
     async def pansexual(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -690,9 +1702,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        pan_colors = [(255, 28, 141), (255, 215, 0), (26, 179, 255)]
-
-        await pride_flag(ctx, image, transparency, pan_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['pansexual'])
 
     @commands.command(aliases=['nb', 'non-binary', 'non_binary'])
     async def nonbinary(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -713,9 +1723,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        nb_colors = [(255, 244, 48), (255, 255, 255), (156, 89, 209), (0, 0, 0)]
-
-        await pride_flag(ctx, image, transparency, nb_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['nonbinary'])
 
     @commands.command(aliases=['nonconforming'])
     async def gnc(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -736,11 +1744,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        gnc_colors = [
-            (80, 40, 76), (150, 71, 122), (93, 150, 247), (255, 255, 255), (93, 150, 247), (150, 71, 122), (80, 40, 76)
-        ]
-
-        await pride_flag(ctx, image, transparency, gnc_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['gnc'])
 
     @commands.command(aliases=['aro'])
     async def aromantic(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -761,9 +1765,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        aromantic_colors = [(58, 166, 63), (168, 212, 122), (255, 255, 255), (170, 170, 170), (0, 0, 0)]
-
-        await pride_flag(ctx, image, transparency, aromantic_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['aromantic'])
 
     @commands.command(aliases=['gq'])
     async def genderqueer(self, ctx: utils.CustomContext, image: Optional[utils.ImageConverter], transparency=50):
@@ -784,9 +1786,7 @@ class Images(commands.Cog):
         5. Specified link
         """
 
-        genderqueer_colors = [(181, 126, 220), (255, 255, 255), (73, 128, 34)]
-
-        await pride_flag(ctx, image, transparency, genderqueer_colors)
+        await pride_flag(ctx, image, transparency, FLAG_COLORS['genderqueer'])
 
     async def cog_command_error(self, ctx: utils.CustomContext, error: Exception):
         embed = None
@@ -803,6 +1803,22 @@ class Images(commands.Cog):
                 color=discord.Color.red()
             )
 
+        if isinstance(error, utils.ImageTooLarge):
+            embed = utils.create_embed(
+                ctx.author,
+                title='Error while making image!',
+                description=str(error),
+                color=discord.Color.red()
+            )
+
+        if isinstance(error, ImageBusy):
+            embed = utils.create_embed(
+                ctx.author,
+                title='Image commands are busy!',
+                description=str(error),
+                color=discord.Color.red()
+            )
+
         if embed:
             return await ctx.send(embed=embed)
 
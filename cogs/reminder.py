@@ -56,12 +56,34 @@ class ReminderCog(commands.Cog, name="Reminder"):
 
                 return await ctx.send(embed=embed)
 
+        quota = int(self.bot.config['reminder_quota'])
+
+        if not self.bot.reminders.reserve(ctx.author.id, quota):
+            embed = utils.create_embed(
+                ctx.author,
+                title='Too many reminders!',
+                description=f'You can only have {quota} active reminders at once, '
+                            'use the `cancel` command to remove some!',
+                color=discord.Color.red()
+            )
+
+            return await ctx.send(embed=embed)
+
         total_seconds = sum([t.seconds for t in durations])
         end_time = datetime.now(timezone.utc) + timedelta(seconds=total_seconds)
 
         destination = channel or ctx.author
 
-        rem = utils.Reminder(ctx.message.id, ctx.author, reminder, destination, end_time, self.bot)
+        rem = utils.Reminder(ctx.message.id, ctx.author.id, reminder, destination.id, end_time, self.bot)
+
+        try:
+            inserted = await rem.save()
+        except BaseException:
+            self.bot.reminders.change_count(ctx.author.id, -1)
+            raise
+
+        if not inserted:
+            self.bot.reminders.change_count(ctx.author.id, -1)
 
         embed = utils.create_embed(
             ctx.author,
@@ -101,8 +123,7 @@ class ReminderCog(commands.Cog, name="Reminder"):
         """Shows your active reminders that you made!
         It will show what the reminders are, when they end, and their ID"""
 
-        filtered_reminders = [reminder for reminder in self.bot.reminders.values()
-                              if reminder is not None and reminder.user == ctx.author]
+        filtered_reminders = await utils.Reminder.fetch_user_reminders(self.bot, ctx.author.id)
 
         if not filtered_reminders:
             embed = utils.create_embed(
@@ -123,12 +144,12 @@ class ReminderCog(commands.Cog, name="Reminder"):
         """Cancels and deletes a reminder using its ID!
         You can get the IDs for your reminders by using the `reminders` command"""
 
-        reminder = self.bot.reminders.get(reminder_id)
+        reminder = await utils.Reminder.fetch(self.bot, reminder_id)
 
         if reminder is None:
             raise commands.BadArgument('A reminder with that ID wasn\'t found!')
 
-        if reminder.user != ctx.author:
+        if reminder.user_id != ctx.author.id:
             embed = utils.create_embed(
                 ctx.author,
                 title='You didn\'t make this reminder!',
@@ -323,7 +323,7 @@ class UtilityCog(commands.Cog, name="Utility"):
             try:
                 added.append(await ctx.guild.create_custom_emoji(
                     name=emote.name,
-                    image=await emote.read(),
+                    image=await ctx.bot.asset_cache.read(str(emote.url), emote.read),
                     reason=f'Added by {ctx.author} ({ctx.author.id})')
                              )
             except (discord.DiscordException, discord.HTTPException, discord.NotFound, discord.Forbidden):
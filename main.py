@@ -87,6 +87,13 @@ async def startup():
 
     async with aiohttp.ClientSession(headers=headers) as session:
         bot.session = session
+        bot.image_fetcher = utils.ImageFetcher(
+            session,
+            max_bytes=int(bot.config['image_fetch_max_bytes']),
+            connect_timeout=float(bot.config['image_fetch_connect_timeout']),
+            read_timeout=float(bot.config['image_fetch_read_timeout']),
+            total_timeout=float(bot.config['image_fetch_timeout'])
+        )
         await bot.start(bot.config['bot_token'])
 
 if __name__ == '__main__':
@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import inspect
 import aiohttp
@@ -10,6 +11,15 @@ from typing import Literal, Union, Optional, List
 
 BASE_URL = 'https://osu.ppy.sh/api/v2/'
 
+# The osu!api only allows about 60 requests a minute, so a few connections kept alive are plenty
+CONNECTION_LIMIT = 8
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+# Tokens get replaced in the background this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_RETRY_DELAY = 60
+
 
 def maybe_dt(string: Optional[str]):
     return datetime.fromisoformat(string.replace('Z', '+00:00')) if string else None
@@ -18,18 +28,23 @@ def maybe_dt(string: Optional[str]):
 def check_access_key(func):
     @functools.wraps(func)
     async def wrapped(self, *args, **kwargs):
-        if not self._access_token or datetime.now(timezone.utc) > self._access_token.expires_at:
-            await self._fetch_access_token()
+        await self._ensure_access_token()
         return await func(self, *args, **kwargs)
 
     return wrapped
 
 
 class OsuApi:
-    def __init__(self, client_id: int, client_secret: str):
+    def __init__(self, client_id: int, client_secret: str, *, session: Optional[aiohttp.ClientSession] = None):
         self._client_id = client_id
         self._client_secret = client_secret
         self._access_token: Optional[AccessToken] = None
+        self._token_fetch: Optional[asyncio.Future] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # A session that's passed in belongs to the caller, and isn't closed by close()
+        self._session = session
+        self._owns_session = session is None
 
         self.headers = {
             'Accept': 'application/json',
@@ -55,6 +70,36 @@ class OsuApi:
 
         self.headers['Authorization'] = 'Bearer ' + self._access_token.access_token
 
+    async def _refresh_access_token(self):
+        # Everything that needs a new token at the same time waits on the same request
+        if self._token_fetch is None or self._token_fetch.done():
+            self._token_fetch = asyncio.ensure_future(self._fetch_access_token())
+
+        # Shielded, so a cancelled command doesn't cancel the fetch for everything else waiting on it
+        await asyncio.shield(self._token_fetch)
+
+    async def _refresh_loop(self):
+        while True:
+            token = self._access_token
+            margin = min(TOKEN_REFRESH_MARGIN, timedelta(seconds=token.expires_in) / 2)
+            delay = (token.expires_at - margin - datetime.now(timezone.utc)).total_seconds()
+
+            await asyncio.sleep(max(delay, 0))
+
+            try:
+                await self._refresh_access_token()
+            except OsuApiException:
+                # Requests fetch a token themselves if it runs out before a retry works
+                await asyncio.sleep(TOKEN_RETRY_DELAY)
+
+    async def _ensure_access_token(self):
+        if not self._access_token or datetime.now(timezone.utc) > self._access_token.expires_at:
+            await self._refresh_access_token()
+
+        # Once there's a token, it gets replaced before it expires, so requests don't have to wait for a new one
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
     @check_access_key
     async def fetch_user(
             self,
@@ -135,16 +180,38 @@ class OsuApi:
 
         return Beatmap.from_dict(data)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Made on first use, since the connector needs a running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL
+            )
+
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+
+        return self._session
+
+    async def close(self):
+        """Stops refreshing the access token, and closes the session used for requests if this OsuApi made it"""
+
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+
     async def _request(self, url: str, method='get', **kwargs) -> Union[dict, list]:
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.request(method, url, **kwargs) as response:
-                    data: dict = await response.json()
+            async with self._get_session().request(method, url, headers=self.headers, **kwargs) as response:
+                data: dict = await response.json()
 
-                if not response.ok:
-                    raise OsuApiException(repr(data))
+            if not response.ok:
+                raise OsuApiException(repr(data))
 
-                return data
+            return data
 
         except Exception as e:
             if isinstance(e, OsuApiException): raise
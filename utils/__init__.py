@@ -1,6 +1,9 @@
 # Utility classes and functions for Doggie Bot
 
 from utils.classes import *
+from utils.assets import *
 from utils.converters import *
+from utils.fetcher import *
 from utils.funcs import *
+from utils.metrics import *
 from utils.help import CustomHelp
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Tuple
+
+from utils.metrics import ASSET_CACHE_LOOKUPS, ASSET_CACHE_BYTES
+
+__all__ = [
+    'AssetCache'
+]
+
+
+class AssetCache:
+    """Keeps the bytes of recently read avatars, emotes and stickers.
+    Discord puts a hash of the image in asset URLs, so a URL always points to the same bytes and can be used as
+    the key. The TTL only stops entries nobody asks for from sitting in the memory budget forever, expired entries
+    are dropped when they're asked for, or when they reach the least recently used end while adding another"""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self._size = 0
+        # Reads that are still downloading, so the same asset asked for twice at once is downloaded once
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires_at, data = entry
+
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._size -= len(data)
+            ASSET_CACHE_BYTES.set(self._size)
+            return None
+
+        self._entries.move_to_end(key)
+        return data
+
+    def _purge_expired(self):
+        # Entries that aren't used move towards the front, so that's where the expired ones pile up
+        now = time.monotonic()
+
+        while self._entries:
+            key, (expires_at, data) = next(iter(self._entries.items()))
+
+            if expires_at >= now:
+                break
+
+            del self._entries[key]
+            self._size -= len(data)
+
+    def _put(self, key: str, data: bytes):
+        self._purge_expired()
+
+        if len(data) > self.max_bytes:
+            ASSET_CACHE_BYTES.set(self._size)
+            return
+
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key)[1])
+
+        self._entries[key] = (time.monotonic() + self.ttl, data)
+        self._size += len(data)
+
+        while self._size > self.max_bytes:
+            _, (_, old_data) = self._entries.popitem(last=False)
+            self._size -= len(old_data)
+
+        ASSET_CACHE_BYTES.set(self._size)
+
+    async def _download(self, key: str, read: Callable[[], Awaitable[bytes]]) -> bytes:
+        try:
+            data = await read()
+            self._put(key, data)
+            return data
+        finally:
+            del self._pending[key]
+
+    async def read(self, url: str, read: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Returns the cached bytes for url, or calls read to download them"""
+
+        data = self._get(url)
+
+        if data is not None:
+            ASSET_CACHE_LOOKUPS.labels('hit').inc()
+            return data
+
+        ASSET_CACHE_LOOKUPS.labels('miss').inc()
+
+        if url not in self._pending:
+            self._pending[url] = asyncio.ensure_future(self._download(url, read))
+
+        # Shielded, so one caller being cancelled doesn't cancel the download for the others
+        return await asyncio.shield(self._pending[url])
@@ -1,19 +1,24 @@
 import discord
 import asyncio
+import heapq
 import yaml
 import asqlite
 import os
 import shutil
+import itertools
 
 from discord import TextChannel, ChannelType, Message, User
 from discord.ext import commands, menus
 from loguru import logger
 
-from dataclasses import dataclass, field, replace
-from datetime import datetime, timezone
-from typing import Union, Optional, Dict, List
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone, timedelta
+from typing import Union, Optional, Dict, List, Iterator
 
 from utils.funcs import guess_user_nitro_status, user_friendly_dt, create_embed, fix_url
+from utils.assets import AssetCache
+from utils.fetcher import ImageFetcher
+from utils.metrics import USERS_RESOLVED, USERS_PENDING, REMINDERS_SCHEDULED, REMINDERS_DISPATCHED, REMINDER_LAG
 
 __all__ = [
     'CustomContext',
@@ -21,6 +26,8 @@ __all__ = [
     'CustomMenu',
     'Emotes',
     'ReminderList',
+    'ReminderRegistry',
+    'ReminderScheduler',
     'Reminder',
     'BasicConfig',
     'LoggingConfig',
@@ -31,6 +38,24 @@ __all__ = [
 dirname = os.getcwd()
 config_file = os.path.join(dirname, 'config.yaml')
 
+# Every SQL statement the bot runs, registered on the database at startup
+STATEMENTS = {
+    'create_reminders_end_time_index': 'CREATE INDEX IF NOT EXISTS reminders_end_time ON reminders (end_time)',
+    'create_reminders_user_id_index':
+        'CREATE INDEX IF NOT EXISTS reminders_user_id ON reminders (user_id, end_time)',
+    'select_reminder_counts': 'SELECT user_id, COUNT(*) AS count FROM reminders GROUP BY user_id',
+    'select_reminder': 'SELECT * FROM reminders WHERE id = ?',
+    'select_user_reminders': 'SELECT * FROM reminders WHERE user_id = ? ORDER BY end_time',
+    'select_reminders_between': 'SELECT * FROM reminders WHERE end_time > ? AND end_time <= ? ORDER BY end_time',
+    'insert_reminder': 'INSERT OR IGNORE INTO reminders VALUES (?, ?, ?, ?, ?)',
+    'delete_reminder': 'DELETE FROM reminders WHERE id = (?)',
+    'select_basic_config': 'SELECT * FROM basic_config',
+    'replace_basic_config': 'REPLACE INTO basic_config VALUES(?, ?, ?, ?)',
+    'clear_mute_role': 'UPDATE basic_config SET mute_role = ? WHERE guild_id = ?',
+    'select_logging_config': 'SELECT * FROM logging_config',
+    'replace_logging_config': 'REPLACE INTO logging_config VALUES(?, ?, ?, ?, ?, ?)'
+}
+
 class CustomContext(commands.Context):
     def __init__(self, **attrs):
         super().__init__(**attrs)
@@ -71,6 +96,48 @@ class CustomBot(commands.Bot):
         self.config['data_dir'] = yaml_config.get('data_dir') or os.getenv('DATA_DIR') or '/data'
         self.config['prometheus_port'] = yaml_config.get('prometheus_port') or os.getenv('PROMETHEUS_PORT') or 8000
         self.config['enable_prometheus'] = yaml_config.get('enable_prometheus') or os.getenv('ENABLE_PROMETHEUS') or False
+        self.config['db_readers'] = yaml_config.get('db_readers') or os.getenv('DB_READERS') or 4
+        self.config['db_commit_window'] = yaml_config.get('db_commit_window') or os.getenv('DB_COMMIT_WINDOW') or 0.005
+        self.config['user_fetch_concurrency'] = \
+            yaml_config.get('user_fetch_concurrency') or os.getenv('USER_FETCH_CONCURRENCY') or 8
+        self.config['reminder_horizon'] = yaml_config.get('reminder_horizon') or os.getenv('REMINDER_HORIZON') or 86_400
+        self.config['reminder_quota'] = yaml_config.get('reminder_quota') or os.getenv('REMINDER_QUOTA') or 100
+        # Every worker has its own copy of the bot's imports, so by default there's one per CPU this process can use,
+        # up to 4. sched_getaffinity respects CPU pinning, cpu_count doesn't
+        usable_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        self.config['image_workers'] = \
+            yaml_config.get('image_workers') or os.getenv('IMAGE_WORKERS') or min(usable_cpus, 4)
+        self.config['image_max_jobs'] = \
+            yaml_config.get('image_max_jobs') or os.getenv('IMAGE_MAX_JOBS') or int(self.config['image_workers']) * 2
+        self.config['image_max_guild_jobs'] = \
+            yaml_config.get('image_max_guild_jobs') or os.getenv('IMAGE_MAX_GUILD_JOBS') or 2
+        self.config['image_max_queued'] = yaml_config.get('image_max_queued') or os.getenv('IMAGE_MAX_QUEUED') or 50
+        self.config['image_max_user_queued'] = \
+            yaml_config.get('image_max_user_queued') or os.getenv('IMAGE_MAX_USER_QUEUED') or 3
+        self.config['image_max_edge'] = yaml_config.get('image_max_edge') or os.getenv('IMAGE_MAX_EDGE') or 2048
+        self.config['image_max_pixels'] = \
+            yaml_config.get('image_max_pixels') or os.getenv('IMAGE_MAX_PIXELS') or 4096 * 4096
+        self.config['image_max_frames'] = yaml_config.get('image_max_frames') or os.getenv('IMAGE_MAX_FRAMES') or 200
+        # Discord's upload limit for servers without boosts
+        self.config['image_max_output_bytes'] = \
+            yaml_config.get('image_max_output_bytes') or os.getenv('IMAGE_MAX_OUTPUT_BYTES') or 10 * 1024 * 1024
+        self.config['image_fetch_max_bytes'] = \
+            yaml_config.get('image_fetch_max_bytes') or os.getenv('IMAGE_FETCH_MAX_BYTES') or 20 * 1024 * 1024
+        self.config['image_fetch_connect_timeout'] = \
+            yaml_config.get('image_fetch_connect_timeout') or os.getenv('IMAGE_FETCH_CONNECT_TIMEOUT') or 5
+        self.config['image_fetch_read_timeout'] = \
+            yaml_config.get('image_fetch_read_timeout') or os.getenv('IMAGE_FETCH_READ_TIMEOUT') or 10
+        self.config['image_fetch_timeout'] = \
+            yaml_config.get('image_fetch_timeout') or os.getenv('IMAGE_FETCH_TIMEOUT') or 30
+        self.config['asset_cache_bytes'] = \
+            yaml_config.get('asset_cache_bytes') or os.getenv('ASSET_CACHE_BYTES') or 32 * 1024 * 1024
+        self.config['asset_cache_ttl'] = yaml_config.get('asset_cache_ttl') or os.getenv('ASSET_CACHE_TTL') or 3600
+        self.config['image_backend'] = yaml_config.get('image_backend') or os.getenv('IMAGE_BACKEND') or 'numpy'
+        self.config['image_cache_bytes'] = \
+            yaml_config.get('image_cache_bytes') or os.getenv('IMAGE_CACHE_BYTES') or 64 * 1024 * 1024
+        # The on-disk tier of the image result cache is off unless given a size
+        self.config['image_cache_disk_bytes'] = \
+            yaml_config.get('image_cache_disk_bytes') or os.getenv('IMAGE_CACHE_DISK_BYTES') or 0
 
         if isinstance(self.config['enable_prometheus'], str):
             if self.config['enable_prometheus'].lower() == 'true':
@@ -85,7 +152,8 @@ class CustomBot(commands.Bot):
             shutil.copy(empty_db_file, self.db_file)
             logger.info('Created empty database')
 
-        self.reminders: Dict[int, Reminder] = {}
+        self.reminders: ReminderRegistry = ReminderRegistry()
+        self.reminder_scheduler: ReminderScheduler = ReminderScheduler(self)
         self.basic_configs: Dict[int, BasicConfig] = {}
         self.logging_configs: Dict[int, LoggingConfig] = {}
         self.sniped: List[Message] = []
@@ -93,8 +161,15 @@ class CustomBot(commands.Bot):
 
         self.fully_ready = False
         self.start_time: datetime = None  # type: ignore
-        self.db: asqlite.Connection = None  # type: ignore
+        self.db: asqlite.Pool = None  # type: ignore
         self.session = None
+        self.image_fetcher: ImageFetcher = None  # type: ignore
+        self.asset_cache: AssetCache = AssetCache(
+            int(self.config['asset_cache_bytes']),
+            float(self.config['asset_cache_ttl'])
+        )
+        # discord.py already waits out rate limits, this just stops every request from being sent at once
+        self.user_fetches = asyncio.Semaphore(int(self.config['user_fetch_concurrency']))
 
     async def setup_hook(self):
         self.loop.create_task(self.startup())
@@ -122,7 +197,20 @@ class CustomBot(commands.Bot):
 
         self.start_time: datetime = datetime.now(timezone.utc)
 
-        self.db: asqlite.Connection = await asqlite.connect(self.db_file, check_same_thread=False)
+        self.db: asqlite.Pool = await asqlite.create_pool(
+            self.db_file,
+            size=int(self.config['db_readers']),
+            commit_window=float(self.config['db_commit_window']),
+            check_same_thread=False
+        )
+
+        for name, sql in STATEMENTS.items():
+            self.db.register(name, sql)
+
+        await self.db.write('create_reminders_end_time_index')
+        await self.db.write('create_reminders_user_id_index')
+
+        self.reminder_scheduler.start()
 
         await self.load_reminders()
         await self.load_basic_config()
@@ -132,6 +220,7 @@ class CustomBot(commands.Bot):
         self.dispatch('fully_ready')
 
     async def close(self):
+        self.reminder_scheduler.stop()
         await self.db.close()
         await super().close()
 
@@ -142,81 +231,85 @@ class CustomBot(commands.Bot):
 
         return await self.fetch_user(self.owner_id or list(self.owner_ids)[0])
 
+    async def resolve_user(self, user_id: int) -> User:
+        """Gets a user from the cache, or fetches it with the other user fetches, raises like `fetch_user`"""
+
+        user = self.get_user(user_id)
+
+        if user is not None:
+            USERS_RESOLVED.labels(source='cache').inc()
+            return user
+
+        USERS_PENDING.inc()
+
+        try:
+            async with self.user_fetches:
+                user = await self.fetch_user(user_id)
+        except discord.NotFound:
+            USERS_RESOLVED.labels(source='not_found').inc()
+            raise
+        except discord.HTTPException:
+            USERS_RESOLVED.labels(source='error').inc()
+            raise
+        finally:
+            USERS_PENDING.dec()
+
+        USERS_RESOLVED.labels(source='fetch').inc()
+        return user
+
     async def load_reminders(self):
-        async with self.db.cursor() as cursor:
-            for row in await cursor.execute('SELECT * FROM reminders'):
-                message_id: int = row['id']
-                try:
-                    user: User = await self.fetch_user(row['user_id'])
-                except discord.NotFound:
-                    user: None = None
-                reminder: str = row['reminder']
-                end_time: int = row['end_time']
-                destination: Union[User, TextChannel] = self.get_channel(row['destination']) or user
-
-                if destination is None or user is None:
-                    continue
-
-                _reminder = Reminder(
-                    message_id=message_id,
-                    user=user,
-                    reminder=reminder,
-                    destination=destination,
-                    end_time=datetime.fromtimestamp(end_time, timezone.utc),
-                    bot=self
-                )
-
-                self.reminders[_reminder.id] = _reminder
+        counts = {row['user_id']: row['count'] async for row in self.db.iterate('select_reminder_counts')}
+        self.reminders.set_counts(counts)
+
+        # Only reminders ending soon are loaded, the scheduler pages in the rest as they get closer
+        await self.reminder_scheduler.load_window()
 
     async def load_basic_config(self):
-        async with self.db.cursor() as cursor:
-            for row in await cursor.execute('SELECT * FROM basic_config'):
-                guild = self.get_guild(row['guild_id'])
-                prefix = row['prefix']
-                snipe = bool(row['snipe'])
-                mute_role = guild.get_role(row['mute_role']) if guild else None
-
-                if not guild:
-                    continue
-
-                config = BasicConfig(
-                    guild=guild,
-                    prefix=prefix,
-                    snipe=snipe,
-                    mute_role=mute_role
-                )
-
-                if row['mute_role'] and not mute_role:
-                    await cursor.execute('UPDATE basic_config SET mute_role = ? WHERE guild_id = ?', (None, guild.id))
-                    await self.db.commit()
-                    continue
-
-                self.basic_configs[config.guild.id] = config
+        async for row in self.db.iterate('select_basic_config'):
+            guild = self.get_guild(row['guild_id'])
+            prefix = row['prefix']
+            snipe = bool(row['snipe'])
+            mute_role = guild.get_role(row['mute_role']) if guild else None
+
+            if not guild:
+                continue
+
+            config = BasicConfig(
+                guild=guild,
+                prefix=prefix,
+                snipe=snipe,
+                mute_role=mute_role
+            )
+
+            if row['mute_role'] and not mute_role:
+                await self.db.write('clear_mute_role', (None, guild.id))
+                continue
+
+            self.basic_configs[config.guild.id] = config
 
     async def load_logging_config(self):
-        async with self.db.cursor() as cursor:
-            for row in await cursor.execute('SELECT * FROM logging_config'):
-                guild: discord.Guild = self.get_guild(row['guild_id'])
-
-                if not guild:
-                    continue
-
-                kick_channel = guild.get_channel(row['kick_channel'])
-                ban_channel = guild.get_channel(row['ban_channel'])
-                purge_channel = guild.get_channel(row['purge_channel'])
-                delete_channel = guild.get_channel(row['delete_channel'])
-                mute_channel = guild.get_channel(row['mute_channel'])
-
-                config = LoggingConfig(
-                    guild=guild,
-                    kick_channel=kick_channel,
-                    ban_channel=ban_channel,
-                    purge_channel=purge_channel,
-                    delete_channel=delete_channel,
-                    mute_channel=mute_channel
-                )
-
-                self.logging_configs[config.guild.id] = config
+        async for row in self.db.iterate('select_logging_config'):
+            guild: discord.Guild = self.get_guild(row['guild_id'])
+
+            if not guild:
+                continue
+
+            kick_channel = guild.get_channel(row['kick_channel'])
+            ban_channel = guild.get_channel(row['ban_channel'])
+            purge_channel = guild.get_channel(row['purge_channel'])
+            delete_channel = guild.get_channel(row['delete_channel'])
+            mute_channel = guild.get_channel(row['mute_channel'])
+
+            config = LoggingConfig(
+                guild=guild,
+                kick_channel=kick_channel,
+                ban_channel=ban_channel,
+                purge_channel=purge_channel,
+                delete_channel=delete_channel,
+                mute_channel=mute_channel
+            )
+
+            self.logging_configs[config.guild.id] = config
 
     @staticmethod
     def get_custom_prefix(_bot: 'CustomBot', message: discord.Message):
@@ -359,45 +452,324 @@ class ReminderList(menus.ListPageSource):
                                                     f'({index}/{self._max_pages}):')
 
         for reminder in entries:
-            channel = reminder.destination if isinstance(reminder.destination, TextChannel) else None
+            destination = 'Your DMS!' if reminder.is_dm else f'<#{reminder.destination}>'
 
             embed.add_field(name=f'ID: {reminder.id}',
                             value=f'**Reminder:** {str(reminder)[:1100]}\n'
                                   f'**Ends at:** {user_friendly_dt(reminder.end_time)}\n'
-                                  f'**Destination:** {channel.mention if channel else "Your DMS!"}\n',
+                                  f'**Destination:** {destination}\n',
                             inline=False)
         return embed
 
 
+class ReminderRegistry:
+    """Holds the loaded reminders by ID, along with how many reminders
+    every user has in total, including the ones that aren't loaded yet"""
+
+    def __init__(self):
+        self._reminders: Dict[int, 'Reminder'] = {}
+        self._counts: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def __contains__(self, reminder_id: int):
+        return reminder_id in self._reminders
+
+    def __iter__(self) -> Iterator['Reminder']:
+        return iter(self._reminders.values())
+
+    def get(self, reminder_id: int) -> Optional['Reminder']:
+        return self._reminders.get(reminder_id)
+
+    def add(self, reminder: 'Reminder'):
+        self._reminders[reminder.id] = reminder
+
+    def discard(self, reminder: 'Reminder'):
+        self._reminders.pop(reminder.id, None)
+
+    def count(self, user_id: int) -> int:
+        return self._counts.get(user_id, 0)
+
+    def reserve(self, user_id: int, quota: int) -> bool:
+        """Counts a reminder the user is about to save, unless it would go over the quota.
+        Done before saving, so two reminders saved at once can't both fit under the quota,
+        the reservation has to be given back with `change_count` if the reminder isn't saved"""
+
+        if self.count(user_id) >= quota:
+            return False
+
+        self.change_count(user_id, 1)
+        return True
+
+    def set_counts(self, counts: Dict[int, int]):
+        self._counts = counts
+
+    def change_count(self, user_id: int, amount: int):
+        count = self._counts.get(user_id, 0) + amount
+
+        if count > 0:
+            self._counts[user_id] = count
+        else:
+            self._counts.pop(user_id, None)
+
+
+class ReminderScheduler:
+    """Sends reminders when they end from a single task, instead of one sleeping task per reminder.
+    Reminders are kept in a heap ordered by end time, cancelled reminders are left in the heap
+    and skipped, until they make up half of it and it gets rebuilt.
+
+    Only reminders ending within the horizon are kept in memory (and in `bot.reminders`),
+    the rest stay in the database and get paged in as the window moves forward"""
+
+    # Wake up at least this often, so changes to the system clock don't delay reminders too much
+    MAX_SLEEP = 300
+    # Reminders that fail to send are tried again after this many seconds, doubled after every attempt
+    RETRY_DELAY = 60
+    MAX_RETRY_DELAY = 3600
+
+    def __init__(self, bot: CustomBot):
+        self.bot: CustomBot = bot
+        self.horizon: int = int(bot.config['reminder_horizon'])
+        self.loaded_until: Optional[int] = None
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}
+        # Breaks ties between entries with the same end time, so the heap never compares reminders,
+        # and a reminder scheduled again doesn't tie with its own cancelled entry
+        self._counter = itertools.count()
+        self._stale = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._page_task: Optional[asyncio.Task] = None
+        self._sending: set = set()
+        self._removed_while_paging: Optional[set] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        if self._page_task is None or self._page_task.done():
+            self._page_task = asyncio.create_task(self._page())
+
+    def stop(self):
+        for task in (self._task, self._page_task):
+            if task is not None:
+                task.cancel()
+
+    def add(self, reminder: 'Reminder'):
+        """Starts tracking a reminder, if it ends outside the loaded window it's left to be paged in later"""
+
+        if self.loaded_until is None or int(reminder.end_time.timestamp()) > self.loaded_until:
+            return
+
+        self.bot.reminders.add(reminder)
+        self.schedule(reminder)
+
+    def remove(self, reminder: 'Reminder'):
+        self.bot.reminders.discard(reminder)
+        self.cancel(reminder)
+
+        if self._removed_while_paging is not None:
+            self._removed_while_paging.add(reminder.id)
+
+    async def load_window(self):
+        """Loads the reminders that end between the current window and the new horizon"""
+
+        previous = self.loaded_until
+        since = previous or 0
+
+        # Moved forward before querying, so reminders saved while this runs are either
+        # added straight away, or already in the database for the query to find
+        self.loaded_until = int(discord.utils.utcnow().timestamp()) + self.horizon
+        self._removed_while_paging = set()
+
+        try:
+            async for row in self.bot.db.iterate('select_reminders_between', (since, self.loaded_until)):
+                # Skips reminders saved while this runs, they were already added with their own object
+                if row['id'] not in self._removed_while_paging and row['id'] not in self._entries:
+                    self.add(Reminder.from_row(row, self.bot))
+        except Exception:
+            # Moved back so the next page loads this part of the window again
+            self.loaded_until = previous
+            raise
+        finally:
+            self._removed_while_paging = None
+
+    async def _page(self):
+        while True:
+            await asyncio.sleep(self.horizon / 2)
+
+            try:
+                await self.load_window()
+            except Exception:
+                logger.exception('Couldn\'t load the next reminder window, retrying on the next page')
+
+    def schedule(self, reminder: 'Reminder', at: Optional[datetime] = None):
+        """Sends the reminder when it ends, or at another time like when it's being retried"""
+
+        self.cancel(reminder)
+
+        entry = [at or reminder.end_time, next(self._counter), reminder]
+        self._entries[reminder.id] = entry
+        heapq.heappush(self._heap, entry)
+        REMINDERS_SCHEDULED.set(len(self._entries))
+
+        # Only need to wake up early if this is the next reminder to be sent
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, reminder: 'Reminder'):
+        entry = self._entries.pop(reminder.id, None)
+
+        if entry is None:
+            return
+
+        entry[-1] = None
+        self._stale += 1
+        REMINDERS_SCHEDULED.set(len(self._entries))
+
+        if self._stale > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _pop(self) -> Optional['Reminder']:
+        entry = heapq.heappop(self._heap)
+        reminder = entry[-1]
+
+        if reminder is None:
+            self._stale -= 1
+        else:
+            del self._entries[reminder.id]
+
+        return reminder
+
+    def retry(self, reminder: 'Reminder'):
+        """Schedules a reminder that couldn't be sent again, waiting longer after every failed attempt"""
+
+        # Cancelled while it was being sent
+        if reminder.id not in self.bot.reminders:
+            return
+
+        delay = min(self.RETRY_DELAY * 2 ** reminder.attempts, self.MAX_RETRY_DELAY)
+        reminder.attempts += 1
+
+        self.schedule(reminder, discord.utils.utcnow() + timedelta(seconds=delay))
+
+    def _sent(self, task: asyncio.Task):
+        self._sending.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error('Sending a reminder failed')
+
+    def _dispatch(self, reminder: 'Reminder'):
+        REMINDERS_DISPATCHED.inc()
+        REMINDER_LAG.observe(max((discord.utils.utcnow() - reminder.end_time).total_seconds(), 0))
+
+        task = asyncio.create_task(reminder.send_reminder())
+        self._sending.add(task)
+        task.add_done_callback(self._sent)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = discord.utils.utcnow()
+
+            while self._heap and (self._heap[0][-1] is None or self._heap[0][0] <= now):
+                reminder = self._pop()
+                if reminder is not None:
+                    self._dispatch(reminder)
+
+            REMINDERS_SCHEDULED.set(len(self._entries))
+
+            timeout = self.MAX_SLEEP
+            if self._heap:
+                timeout = min((self._heap[0][0] - now).total_seconds(), timeout)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
 @dataclass
 class Reminder:
+    """A reminder that only stores IDs, the user and channel are resolved right before it's sent"""
+
     message_id: int
-    user: User
+    user_id: int
     reminder: str
-    destination: Union[User, TextChannel]
+    destination: int
     end_time: datetime
     bot: CustomBot
-    id: int = field(init=False)
-    task: asyncio.Future = field(init=False)
+    # Failed attempts at sending it, for the retry backoff
+    attempts: int = 0
+
+    @classmethod
+    def from_row(cls, row, bot: CustomBot) -> 'Reminder':
+        return cls(
+            message_id=row['id'],
+            user_id=row['user_id'],
+            reminder=row['reminder'],
+            destination=row['destination'],
+            end_time=datetime.fromtimestamp(row['end_time'], timezone.utc),
+            bot=bot
+        )
+
+    @classmethod
+    async def fetch(cls, bot: CustomBot, reminder_id: int) -> Optional['Reminder']:
+        """Gets a reminder from memory, or from the database if it isn't loaded yet"""
+
+        if reminder_id in bot.reminders:
+            return bot.reminders.get(reminder_id)
+
+        row = await bot.db.fetchone('select_reminder', (reminder_id,))
+        return cls.from_row(row, bot) if row else None
+
+    @classmethod
+    async def fetch_user_reminders(cls, bot: CustomBot, user_id: int) -> List['Reminder']:
+        return [cls.from_row(row, bot) for row in await bot.db.fetchall('select_user_reminders', (user_id,))]
+
+    @property
+    def id(self) -> int:
+        # The ID of the message that made the reminder, so it stays the same after restarts
+        return self.message_id
+
+    @property
+    def is_dm(self) -> bool:
+        return self.destination == self.user_id
+
+    async def save(self) -> bool:
+        """Saves and schedules a new reminder, the user's count has to be reserved with `ReminderRegistry.reserve`
+        first. Returns whether it was inserted, a reminder with the same ID may already exist"""
+
+        inserted = await self.bot.db.write(
+            'insert_reminder',
+            (self.message_id,
+             self.user_id,
+             self.reminder,
+             int(self.end_time.timestamp()),
+             self.destination)
+        )
+
+        if inserted:
+            self.bot.reminder_scheduler.add(self)
 
-    def __post_init__(self):
-        self.id = len(self.bot.reminders) + 1
-        self.task = asyncio.ensure_future(self.send_reminder())
-        self.bot.reminders[self.id] = self
+        return bool(inserted)
 
     async def send_reminder(self):
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                'INSERT OR IGNORE INTO reminders VALUES (?, ?, ?, ?, ?)',
-                (self.message_id,
-                 self.user.id,
-                 self.reminder,
-                 int(self.end_time.timestamp()),
-                 self.destination.id)
-            )
+        try:
+            user: User = await self.bot.resolve_user(self.user_id)
+        except discord.NotFound:
+            return await self.remove()
+        except discord.HTTPException as e:
+            logger.warning('Couldn\'t fetch the owner of reminder {}, retrying later: {}', self.id, e)
+            return self.bot.reminder_scheduler.retry(self)
 
-        await self.bot.db.commit()
-        await discord.utils.sleep_until(self.end_time)
+        destination: Union[User, TextChannel] = user if self.is_dm else self.bot.get_channel(self.destination) or user
 
         embed = discord.Embed(
             title='Reminder!',
@@ -405,21 +777,21 @@ class Reminder:
             color=discord.Color.green()
         )
 
-        if isinstance(self.destination, TextChannel):
+        if isinstance(destination, TextChannel):
             embed.set_footer(
-                icon_url=fix_url(self.user.display_avatar),
-                text=f'Reminder sent by {self.user}'
+                icon_url=fix_url(user.display_avatar),
+                text=f'Reminder sent by {user}'
             )
 
         else:
             embed.set_footer(
-                icon_url=fix_url(self.user.display_avatar),
+                icon_url=fix_url(user.display_avatar),
                 text=f'This reminder is sent by you!'
             )
 
         try:
-            await self.destination.send(
-                f"**Hey {self.user.mention},**" if isinstance(self.destination, TextChannel) else None,
+            await destination.send(
+                f"**Hey {user.mention},**" if isinstance(destination, TextChannel) else None,
                 embed=embed
             )
 
@@ -429,12 +801,12 @@ class Reminder:
         await self.remove()
 
     async def remove(self):
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute('DELETE FROM reminders WHERE id = (?)', (self.message_id,))
-        await self.bot.db.commit()
+        deleted = await self.bot.db.write('delete_reminder', (self.message_id,))
 
-        self.bot.reminders[self.id] = None
-        self.task.cancel()
+        if deleted:
+            self.bot.reminders.change_count(self.user_id, -1)
+
+        self.bot.reminder_scheduler.remove(self)
 
     def __str__(self):
         return self.reminder
@@ -450,18 +822,15 @@ class BasicConfig:
     async def set_config(self, bot: CustomBot, **kwargs) -> 'BasicConfig':
         config = replace(self, **kwargs)
 
-        async with bot.db.cursor() as cursor:
-            await cursor.execute(
-                'REPLACE INTO basic_config VALUES(?, ?, ?, ?)',
-                (
-                    config.guild.id,
-                    config.prefix,
-                    config.snipe,
-                    config.mute_role.id if config.mute_role else None
-                )
+        await bot.db.write(
+            'replace_basic_config',
+            (
+                config.guild.id,
+                config.prefix,
+                config.snipe,
+                config.mute_role.id if config.mute_role else None
             )
-
-        await bot.db.commit()
+        )
 
         bot.basic_configs[config.guild.id] = config
 
@@ -480,20 +849,17 @@ class LoggingConfig:
     async def set_config(self, bot: CustomBot, **kwargs) -> 'LoggingConfig':
         config = replace(self, **kwargs)
 
-        async with bot.db.cursor() as cursor:
-            await cursor.execute(
-                'REPLACE INTO logging_config VALUES(?, ?, ?, ?, ?, ?)',
-                (
-                    config.guild.id,
-                    config.kick_channel.id if config.kick_channel else None,
-                    config.ban_channel.id if config.ban_channel else None,
-                    config.purge_channel.id if config.purge_channel else None,
-                    config.delete_channel.id if config.delete_channel else None,
-                    config.mute_channel.id if config.mute_channel else None
-                )
+        await bot.db.write(
+            'replace_logging_config',
+            (
+                config.guild.id,
+                config.kick_channel.id if config.kick_channel else None,
+                config.ban_channel.id if config.ban_channel else None,
+                config.purge_channel.id if config.purge_channel else None,
+                config.delete_channel.id if config.delete_channel else None,
+                config.mute_channel.id if config.mute_channel else None
             )
-
-        await bot.db.commit()
+        )
 
         bot.logging_configs[config.guild.id] = config
 
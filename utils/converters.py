@@ -1,13 +1,17 @@
+import asyncio
+import functools
 import re
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Tuple, Iterable
 
 import discord
 from discord.ext import commands
 from discord import Member, User, TextChannel
 
+from utils.fetcher import ImageFetchError
+
 __all__ = [
     'IntentionalMember',
     'IntentionalUser',
@@ -15,10 +19,20 @@ __all__ = [
     'MentionedTextChannel',
     'EmbedConverter',
     'NitrolessEmoteConverter',
-    'ImageConverter'
+    'ImageConverter',
+    'ImageTooLarge'
 ]
 
 ID_REGEX = re.compile(r'([0-9]{15,20})$')
+USER_MENTION_REGEX = re.compile(r'<@!?([0-9]{15,20})>$')
+# NitrolessEmoteConverter accepts ; in place of :
+EMOTE_REGEX = re.compile(r'<?a?[:;][A-Za-z0-9_]+[:;][0-9]{15,20}>?$')
+URL_REGEX = re.compile(r'<?https?://\S+$')
+MESSAGE_LINK_REGEX = re.compile(
+    r'<?https?://(?:(?:ptb|canary|www)\.)?discord(?:app)?\.com/channels/'
+    r'(?:[0-9]{15,20}|@me)/[0-9]{15,20}/[0-9]{15,20}/?>?$'
+)
+CHANNEL_MESSAGE_REGEX = re.compile(r'[0-9]{15,20}-[0-9]{15,20}$')
 
 
 class IntentionalMember(commands.converter.MemberConverter):
@@ -26,7 +40,7 @@ class IntentionalMember(commands.converter.MemberConverter):
         if not (len(argument) > 5 and argument[-5] == '#') and not \
             argument.startswith('@') and not \
             self._get_id_match(argument) and not \
-            re.match(r'<@!?([0-9]{15,20})>$', argument):
+            USER_MENTION_REGEX.match(argument):
             # Not a mention or an ID a name#tag or @username
             raise commands.errors.MemberNotFound(argument)
 
@@ -38,7 +52,7 @@ class IntentionalUser(commands.converter.UserConverter):
         if not (len(argument) > 5 and argument[-5] == '#') and not \
             argument.startswith('@') and not \
             self._get_id_match(argument) and not \
-            re.match(r'<@!?([0-9]{15,20})>$', argument):
+            USER_MENTION_REGEX.match(argument):
             # Not a mention or an ID a name#tag or @username
             raise commands.errors.UserNotFound(argument)
 
@@ -209,36 +223,108 @@ class NitrolessEmoteConverter(commands.Converter):
         return await commands.PartialEmojiConverter().convert(ctx, argument)
 
 
+class ImageTooLarge(commands.CommandError):
+    pass
+
+
+def too_large_message(name: str, max_bytes: int) -> str:
+    return f'The {name} is too large! (max {max_bytes / 1024 / 1024:g} MiB)'
+
+
 class ImageConverter(commands.Converter):
     @staticmethod
-    async def fake_asset_read(ctx, *, url):
-        asset = discord.Asset(ctx.bot._connection, url=url, key='')
-
+    async def fetch_url(ctx, *, url, cache: bool = False, explicit: bool = False):
         try:
-            return await asset.read()
-        except (discord.DiscordException, discord.HTTPException, discord.NotFound):
+            # Only links that always point to the same image, like stickers, should be cached
+            if cache:
+                return await ctx.bot.asset_cache.read(url, functools.partial(ctx.bot.image_fetcher.fetch, url))
+
+            return await ctx.bot.image_fetcher.fetch(url)
+        except ImageFetchError as e:
+            # A link that was given on purpose shouldn't quietly fall back to something else
+            if explicit and str(e) == 'too_large':
+                raise ImageTooLarge(too_large_message('linked image', ctx.bot.image_fetcher.max_bytes))
+
             return None
 
-    async def arg_converter(self, ctx, arg: str):
-        try:
-            user = await commands.UserConverter().convert(ctx, arg)
-            return await user.display_avatar.read()
-        except (commands.BadArgument, commands.CommandError):
-            pass
+    @staticmethod
+    async def read_asset(ctx, asset: Union[discord.Asset, discord.Emoji, discord.PartialEmoji]) -> bytes:
+        return await ctx.bot.asset_cache.read(str(asset.url), asset.read)
 
-        try:
-            emoji = await NitrolessEmoteConverter().convert(ctx, arg)
-            return await emoji.read()
-        except (commands.BadArgument, commands.CommandError):
-            pass
+    @staticmethod
+    def candidates(arg: str) -> Tuple[str, ...]:
+        """Guesses what an argument can be from its shape alone, so only lookups that can work get made"""
 
-        if arg.startswith('http'):
-            asset_bytes = await self.fake_asset_read(ctx, url=arg)
+        arg = arg.strip('`\n \\')
 
-            if asset_bytes: return asset_bytes
+        if MESSAGE_LINK_REGEX.match(arg) or CHANNEL_MESSAGE_REGEX.match(arg):
+            return 'message',
+        if USER_MENTION_REGEX.match(arg):
+            return 'user',
+        if EMOTE_REGEX.match(arg):
+            return 'emoji',
+        if URL_REGEX.match(arg):
+            return 'url',
+        if ID_REGEX.match(arg):
+            # Snowflakes are unique, so at most one of these will find something
+            return 'message', 'user', 'emoji'
+
+        # Names, like a username or an emote's name
+        return 'user', 'emoji'
+
+    async def user_image(self, ctx, arg: str) -> bytes:
+        user = await commands.UserConverter().convert(ctx, arg)
+        return await self.read_asset(ctx, user.display_avatar)
+
+    async def emoji_image(self, ctx, arg: str) -> bytes:
+        emoji = await NitrolessEmoteConverter().convert(ctx, arg)
+        return await self.read_asset(ctx, emoji)
+
+    async def url_image(self, ctx, arg: str) -> bytes:
+        asset_bytes = await self.fetch_url(ctx, url=arg.strip('<>\n '), explicit=True)
+
+        if asset_bytes: return asset_bytes
+
+        raise commands.BadArgument()
+
+    async def message_image(self, ctx, arg: str) -> bytes:
+        message = await commands.MessageConverter().convert(ctx, arg.strip('<>'))
+        return await self.message_convert(ctx, message)
+
+    async def resolve(self, ctx, arg: str, kinds: Iterable[str]) -> bytes:
+        """Runs the lookups for every kind at once, and returns the image from the first kind in the list
+        that succeeds, so a name that is both a user and an emote still gets the user like before"""
+
+        lookups = {
+            'message': self.message_image,
+            'user': self.user_image,
+            'emoji': self.emoji_image,
+            'url': self.url_image
+        }
+
+        tasks = [asyncio.ensure_future(lookups[kind](ctx, arg)) for kind in kinds]
+
+        try:
+            # Awaited in order, the later lookups keep running in the meantime
+            for task in tasks:
+                try:
+                    return await task
+                except ImageTooLarge:
+                    raise
+                except (commands.BadArgument, commands.CommandError, discord.HTTPException):
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
 
         raise commands.BadArgument()
 
+    async def arg_converter(self, ctx, arg: str):
+        # Message content is looked up as is, it can't point to another message
+        kinds = [kind for kind in self.candidates(arg) if kind != 'message']
+
+        return await self.resolve(ctx, arg, kinds)
+
     async def message_convert(self, ctx, message: discord.Message, arg: Optional[str] = None) -> bytes:
         if arg:
             return await self.arg_converter(ctx, arg)
@@ -246,21 +332,27 @@ class ImageConverter(commands.Converter):
         arg = message.content
 
         if message.attachments:
-            if message.attachments[0].content_type.startswith('image'):
-                return await message.attachments[0].read()
+            attachment = message.attachments[0]
+
+            if attachment.content_type and attachment.content_type.startswith('image'):
+                # Discord gives the size up front, so oversized attachments are turned down without downloading them
+                if attachment.size > ctx.bot.image_fetcher.max_bytes:
+                    raise ImageTooLarge(too_large_message('attachment', ctx.bot.image_fetcher.max_bytes))
+
+                return await attachment.read()
 
         if message.stickers and message.stickers[0].format != discord.StickerFormatType.lottie:
-            asset_bytes = await self.fake_asset_read(ctx, url=message.stickers[0].url)
+            asset_bytes = await self.fetch_url(ctx, url=message.stickers[0].url, cache=True)
             if asset_bytes: return asset_bytes
 
         if message.embeds:
             if message.embeds[0].image:
-                asset_bytes = await self.fake_asset_read(ctx, url=message.embeds[0].image.url)
+                asset_bytes = await self.fetch_url(ctx, url=message.embeds[0].image.url)
 
                 if asset_bytes: return asset_bytes
 
             if message.embeds[0].thumbnail:
-                asset_bytes = await self.fake_asset_read(ctx, url=message.embeds[0].thumbnail.url)
+                asset_bytes = await self.fetch_url(ctx, url=message.embeds[0].thumbnail.url)
 
                 if asset_bytes: return asset_bytes
 
@@ -274,13 +366,7 @@ class ImageConverter(commands.Converter):
             if ctx.message.reference or ctx.message.attachments:
                 raise commands.BadArgument()
 
-            try:
-                message = await commands.MessageConverter().convert(ctx, argument)
-                return await self.message_convert(ctx, message)
-            except commands.BadArgument:
-                pass
-
-            return await self.message_convert(ctx, ctx.message, argument)
+            return await self.resolve(ctx, argument, self.candidates(argument))
 
         if ctx.message.reference:
             try:
@@ -294,4 +380,4 @@ class ImageConverter(commands.Converter):
         except commands.BadArgument:
             pass
 
-        return await ctx.author.display_avatar.read()
+        return await self.read_asset(ctx, ctx.author.display_avatar)
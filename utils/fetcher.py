@@ -0,0 +1,85 @@
+import asyncio
+
+import aiohttp
+
+from yarl import URL
+
+from utils.metrics import IMAGE_FETCHES
+
+__all__ = [
+    'ImageFetchError',
+    'ImageFetcher'
+]
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class ImageFetcher:
+    """Downloads images from arbitrary links on the bot's session. The body is read in chunks and
+    the download is dropped as soon as it goes over max_bytes, so a huge or slow link can't hold on
+    to memory or a socket for long"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            *,
+            max_bytes: int,
+            connect_timeout: float,
+            read_timeout: float,
+            total_timeout: float
+    ):
+        self.session = session
+        self.max_bytes = max_bytes
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout
+        )
+
+    async def _read(self, url: str) -> bytes:
+        if URL(url).scheme not in ('http', 'https'):
+            raise ImageFetchError('bad_url')
+
+        async with self.session.get(url, timeout=self.timeout) as resp:
+            if resp.status != 200:
+                raise ImageFetchError('bad_status')
+
+            if not resp.content_type.startswith('image/'):
+                raise ImageFetchError('bad_type')
+
+            # Not every server sends a length, so the size is checked again while reading
+            if resp.content_length is not None and resp.content_length > self.max_bytes:
+                raise ImageFetchError('too_large')
+
+            data = bytearray()
+
+            async for chunk in resp.content.iter_chunked(self.CHUNK_SIZE):
+                data += chunk
+
+                if len(data) > self.max_bytes:
+                    raise ImageFetchError('too_large')
+
+            return bytes(data)
+
+    async def fetch(self, url: str) -> bytes:
+        """Downloads an image, raises ImageFetchError with the reason if it can't be used"""
+
+        try:
+            data = await self._read(url)
+        except ImageFetchError as e:
+            IMAGE_FETCHES.labels(str(e)).inc()
+            raise
+        except asyncio.TimeoutError:
+            IMAGE_FETCHES.labels('timeout').inc()
+            raise ImageFetchError('timeout')
+        except (aiohttp.ClientError, ValueError):
+            # ValueError covers links aiohttp can't parse
+            IMAGE_FETCHES.labels('error').inc()
+            raise ImageFetchError('error')
+
+        IMAGE_FETCHES.labels('ok').inc()
+        return data
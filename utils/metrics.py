@@ -0,0 +1,106 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+__all__ = [
+    'USERS_RESOLVED',
+    'USERS_PENDING',
+    'REMINDERS_SCHEDULED',
+    'REMINDERS_DISPATCHED',
+    'REMINDER_LAG',
+    'IMAGE_JOBS_QUEUED',
+    'IMAGE_JOBS_RUNNING',
+    'IMAGE_JOBS_REJECTED',
+    'IMAGE_JOB_WAIT',
+    'IMAGE_CACHE_LOOKUPS',
+    'IMAGE_CACHE_BYTES',
+    'IMAGE_ENCODE_SECONDS',
+    'IMAGE_FETCHES',
+    'ASSET_CACHE_LOOKUPS',
+    'ASSET_CACHE_BYTES'
+]
+
+# These are only exported when the PrometheusCog is enabled, see main.py
+
+USERS_RESOLVED = Counter(
+    'doggie_users_resolved',
+    'Users resolved, by where they were found',
+    ['source']
+)
+
+USERS_PENDING = Gauge(
+    'doggie_users_pending',
+    'Users still waiting to be fetched from the API'
+)
+
+REMINDERS_SCHEDULED = Gauge(
+    'doggie_reminders_scheduled',
+    'Reminders waiting in the reminder scheduler'
+)
+
+REMINDERS_DISPATCHED = Counter(
+    'doggie_reminders_dispatched',
+    'Reminders dispatched by the reminder scheduler'
+)
+
+REMINDER_LAG = Histogram(
+    'doggie_reminder_lag_seconds',
+    'How late reminders were dispatched compared to their end time',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+IMAGE_JOBS_QUEUED = Gauge(
+    'doggie_image_jobs_queued',
+    'Image jobs waiting for a free slot'
+)
+
+IMAGE_JOBS_RUNNING = Gauge(
+    'doggie_image_jobs_running',
+    'Image jobs currently running'
+)
+
+IMAGE_JOBS_REJECTED = Counter(
+    'doggie_image_jobs_rejected',
+    'Image jobs rejected because the queue or the user\'s share of it was full',
+    ['reason']
+)
+
+IMAGE_JOB_WAIT = Histogram(
+    'doggie_image_job_wait_seconds',
+    'How long image jobs waited in the queue before running',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+IMAGE_CACHE_LOOKUPS = Counter(
+    'doggie_image_cache_lookups',
+    'Image result cache lookups, by the tier that had the result or miss',
+    ['result']
+)
+
+IMAGE_CACHE_BYTES = Gauge(
+    'doggie_image_cache_bytes',
+    'Bytes held by the image result cache, by tier',
+    ['tier']
+)
+
+IMAGE_ENCODE_SECONDS = Histogram(
+    'doggie_image_encode_seconds',
+    'Time spent encoding image results, by format',
+    ['format'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+IMAGE_FETCHES = Counter(
+    'doggie_image_fetches',
+    'Images downloaded from links, by result',
+    ['result']
+)
+
+ASSET_CACHE_LOOKUPS = Counter(
+    'doggie_asset_cache_lookups',
+    'Avatar, emote and sticker reads, by whether they were cached',
+    ['result']
+)
+
+ASSET_CACHE_BYTES = Gauge(
+    'doggie_asset_cache_bytes',
+    'Bytes held by the avatar, emote and sticker cache'
+)